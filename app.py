@@ -1,21 +1,33 @@
 import streamlit as st
 import json
 import os
-import textwrap
-import base64
+import time
 from itertools import combinations
+from urllib.parse import quote
+import profiling
+from profiling import timed
 from combo_optimizer import ComboOptimizer
+from loadout_solver import EXACT_BOUND_TOWERS, lineup_metric
+from config_writer import ConfigWriter
+from solve_cache import ResultCache
+from disk_cache import open_disk_cache
+from interning import GameIds
+from weekly_backend import BackgroundRun
+from scoring_rules import load_scoring_rules
+from optimizer_core import (DISK_CACHE_FILE, USER_CONFIG_FILE, Optimizer, analyze_user_setup, compile_score_engine,
+                            data_version, initial_settings, load_defaults, load_game_data, load_user_config)
 
 # --- 1. SETUP & CONFIGURATION ---
 st.set_page_config(page_title="Vanguard 2.0: Strategy Engine", layout="wide")
+_run_started = time.perf_counter()
 
-# Paths
-DATA_DIR = "data"
-DEFAULTS_FILE = os.path.join(DATA_DIR, "defaults.json")
-TOWERS_FILE = os.path.join(DATA_DIR, "towers.json")
-ENEMIES_FILE = os.path.join(DATA_DIR, "enemies.json")
-CARDS_FILE = os.path.join(DATA_DIR, "cards.json")
-USER_CONFIG_FILE = "user_config.json"
+# Runner-up lineups shown under the Quick Lineup (best one included)
+ALTERNATIVE_LINEUPS = 5
+# Seconds between progress polls of the background weekly computation
+WEEKLY_POLL_S = 0.5
+
+# Tower icons are CSS backgrounds (get_icon_css); sized by each tile
+ICON_BASE_CSS = ".gd-icon{background-repeat:no-repeat;background-position:center;background-size:contain}"
 
 # Color Mapping for UI
 TYPE_COLORS = {
@@ -27,78 +39,45 @@ TYPE_COLORS = {
 }
 
 # --- 2. DATA LOADING & PERSISTENCE ---
-@st.cache_data
-def load_data():
-    # Load Towers
-    if os.path.exists(TOWERS_FILE):
-        with open(TOWERS_FILE, 'r') as f: towers = json.load(f)
-    else:
-        towers = {} 
-
-    # Load Enemies
-    if os.path.exists(ENEMIES_FILE):
-        with open(ENEMIES_FILE, 'r') as f: enemies = json.load(f)
-    else:
-        # Fallback to prevent crash if file missing
-        enemies = [{"id": "dummy", "name": "Unknown Enemy", "type": "Normal", "tags": [], "weakness_types": [], "resistance_types": []}]
-    
-    # Load Cards
-    if os.path.exists(CARDS_FILE):
-        with open(CARDS_FILE, 'r') as f: cards = json.load(f)
-    else:
-        cards = []
-
-    enemies_dict = {e['id']: e for e in enemies}
-    
-    # Process Synergies & Card Lookup
-    synergy_map = {}
-    cards_by_tower = {} 
-    
-    for c in cards:
-        # Build Synergy Map
-        if c.get('type') == 'Combo' and 'combo_partner' in c:
-            pair_key = frozenset({c['tower_id'], c['combo_partner']})
-            if pair_key not in synergy_map:
-                synergy_map[pair_key] = []
-            synergy_map[pair_key].append(c)
-        
-        # Build Card Lookup
-        tid = c['tower_id']
-        tier = c['tier']
-        if tid not in cards_by_tower: cards_by_tower[tid] = {1: [], 2: [], 3: []}
-        if tier in cards_by_tower[tid]:
-            cards_by_tower[tid][tier].append(c)
-            
-    return towers, enemies_dict, synergy_map, cards_by_tower
-
-def load_defaults():
-    if os.path.exists(DEFAULTS_FILE):
-        with open(DEFAULTS_FILE, 'r') as f: return json.load(f)
-    return {}
-
-def load_user_config():
-    if os.path.exists(USER_CONFIG_FILE):
-        try:
-            with open(USER_CONFIG_FILE, 'r') as f: return json.load(f)
-        except: return None
-    return None
+@st.cache_resource
+def get_config_writer():
+    """Write-behind writer for user_config.json, shared by every session of this process"""
+    return ConfigWriter(USER_CONFIG_FILE)
 
 def save_user_config():
-    """Saves current session state to disk to survive refreshes."""
+    """Saves current session state to survive refreshes. Only snapshots it: the write is
+    debounced, atomic and done off the UI thread (config_writer.ConfigWriter)."""
     config_data = {
         "user_towers": st.session_state.user_towers,
         "weekly_enemy_pool": st.session_state.weekly_enemy_pool,
         "card_setup": st.session_state.card_setup,
         "active_waves": st.session_state.active_waves,
         "page": st.session_state.page,
-        "mode_2vs1": st.session_state.get("mode_2vs1", False)
+        "mode_2vs1": st.session_state.get("mode_2vs1", False),
+        "exact_solver": st.session_state.get("exact_solver", False),
+        "solve_budget_ms": st.session_state.get("solve_budget_ms", 0)
     }
-    with open(USER_CONFIG_FILE, 'w') as f:
-        json.dump(config_data, f, indent=4)
+    get_config_writer().save(config_data)
+
+@st.cache_resource
+def get_disk_cache(version):
+    """On-disk cache under data/ for this data version (None if it cannot be opened)"""
+    return open_disk_cache(DISK_CACHE_FILE, version)
+
+@st.cache_data
+def get_game_data(version):
+    return load_game_data(get_disk_cache(version))
 
-towers_db, enemies_db, synergy_db, cards_db = load_data()
+@st.cache_resource
+def get_scoring_rules(version):
+    """data/scoring_rules.json, loaded once per data version"""
+    return load_scoring_rules()
+
+DATA_VERSION = st.cache_data(data_version)()
+towers_db, enemies_db, synergy_db, cards_db, card_index = get_game_data(DATA_VERSION)
 defaults = load_defaults()
-user_conf = load_user_config()
+# Only a new session needs the saved config; a save still queued is newer than the file
+user_conf = None if 'page' in st.session_state else (get_config_writer().pending() or load_user_config())
 
 # --- 3. SESSION STATE INITIALIZATION ---
 
@@ -106,380 +85,139 @@ user_conf = load_user_config()
 if 'page' not in st.session_state:
     st.session_state.page = user_conf['page'] if (user_conf and 'page' in user_conf) else 'setup'
 
-# 2. User Towers
-if 'user_towers' not in st.session_state:
-    if user_conf and 'user_towers' in user_conf:
-        st.session_state.user_towers = user_conf['user_towers']
-    else:
-        default_ids = defaults.get("available_towers", list(towers_db.keys())[:9])
-        st.session_state.user_towers = [tid for tid in default_ids if tid in towers_db]
-
-# 3. Enemy Pool (Ensure not empty)
-if 'weekly_enemy_pool' not in st.session_state:
-    if user_conf and 'weekly_enemy_pool' in user_conf and user_conf['weekly_enemy_pool']:
-        st.session_state.weekly_enemy_pool = user_conf['weekly_enemy_pool']
-    else:
-        default_pool = defaults.get("weekly_enemy_pool", [])
-        valid_pool = [eid for eid in default_pool if eid in enemies_db]
-        if not valid_pool: 
-            valid_pool = list(enemies_db.keys())[:8]
-        st.session_state.weekly_enemy_pool = valid_pool
-
-# 4. Card Setup
-if 'card_setup' not in st.session_state:
-    st.session_state.card_setup = user_conf['card_setup'] if (user_conf and 'card_setup' in user_conf) else defaults.get("weekly_card_setup", {})
-
-# 5. Active Waves (Ensure exactly 3 valid items)
-if 'active_waves' not in st.session_state:
-    if user_conf and 'active_waves' in user_conf and len(user_conf['active_waves']) == 3:
-        st.session_state.active_waves = user_conf['active_waves']
-    else:
-        pool = st.session_state.weekly_enemy_pool
-        # Safety: If pool is empty, use the first enemy in DB
-        safe_fill = pool[0] if pool else list(enemies_db.keys())[0]
-        waves = [safe_fill] * 3
-        for i in range(min(len(pool), 3)):
-            waves[i] = pool[i]
-        st.session_state.active_waves = waves
-
-# 6. Mode 2vs1
-if 'mode_2vs1' not in st.session_state:
-    st.session_state.mode_2vs1 = user_conf.get("mode_2vs1", False) if user_conf else False
+# 2-7. Towers, enemy pool, card setup, active waves, modes
+for key, value in initial_settings(defaults, user_conf, towers_db, enemies_db).items():
+    if key not in st.session_state:
+        st.session_state[key] = value
 
 # --- 4. SCORING & OPTIMIZATION LOGIC ---
 
-def get_combo_tags(description, name):
-    desc = description.lower() + " " + name.lower()
-    tags = set()
-    if any(x in desc for x in ["fire", "flame", "burn", "ignition"]): tags.add("Fire")
-    if any(x in desc for x in ["lightning", "shock", "paralyze", "thunder", "electric"]): tags.add("Electric")
-    if any(x in desc for x in ["laser", "beam", "energy", "refraction"]): tags.add("Energy")
-    if any(x in desc for x in ["physical", "shell", "bullet", "mine", "impact"]): tags.add("Physical")
-    if any(x in desc for x in ["force", "black hole", "pull", "teleport", "disruption"]): tags.add("Force-field")
-    if "vulnerable" in desc: tags.add("Vulnerable")
-    if "slow" in desc: tags.add("Slow")
-    return tags
-
-def analyze_user_setup(user_setup):
-    active_conditions = set()
-    for tower_id, config in user_setup.items():
-        all_cards = config.get("tier_1", []) + config.get("tier_2", [])
-        all_text = " ".join([str(c).lower() for c in all_cards if c])
-        if any(x in all_text for x in ["ignition", "burn", "flame"]): active_conditions.add("Burn")
-        if any(x in all_text for x in ["paraly", "shock"]): active_conditions.add("Paralyze")
-        if any(x in all_text for x in ["slow", "stasis", "matrix"]): active_conditions.add("Slow")
-        if any(x in all_text for x in ["vulnerable", "mark"]): active_conditions.add("Vulnerable")
-    return active_conditions
-
 def get_active_chains_text(tower_id):
     if tower_id not in st.session_state.card_setup: return ""
-    setup = st.session_state.card_setup[tower_id]
-    selected_names = set([c for c in (setup.get("tier_1", []) + setup.get("tier_2", [])) if c])
-    chains = {}
-    for tier in [1, 2]:
-        for card in cards_db.get(tower_id, {}).get(tier, []):
-            if card['name'] in selected_names and 'chain_group' in card:
-                group = card['chain_group']
-                step = card['chain_step']
-                if group not in chains or step > chains[group]:
-                    chains[group] = step
-    if not chains: return ""
-    parts = []
-    for group, step in chains.items():
-        roman = "I" * step if step < 4 else str(step)
-        parts.append(f"{group} ({roman})")
-    return "⛓️ " + ", ".join(parts)
-
-def has_matrix_thunderbolt_setup():
-    """Check if Tesla Coil has Trap Matrix + Enhanced Matrix equipped (Matrix Thunderbolt setup)."""
-    if "tesla_coil" not in st.session_state.card_setup:
-        return False
-    setup = st.session_state.card_setup["tesla_coil"]
-    equipped = set([c for c in (setup.get("tier_1", []) + setup.get("tier_2", [])) if c])
-    return "Trap Matrix" in equipped and "Enhanced Matrix" in equipped
-
-def calculate_single_score(enemy_id, tower_id):
-    enemy = enemies_db[enemy_id]
-    tower = towers_db[tower_id]
-    score = 100.0
-    notes = []
-
-    # 1. Chain Bonus
-    active_chains_text = get_active_chains_text(tower_id)
-    if active_chains_text:
-        chain_count = active_chains_text.count("(") 
-        chain_bonus = chain_count * 15
-        score += chain_bonus 
-
-    # 2. Tags Logic
-    active_tags = set(tower.get('damage_tags', []))
-    if tower_id in st.session_state.card_setup:
-        setup = st.session_state.card_setup[tower_id]
-        all_selected_card_names = setup.get("tier_1", []) + setup.get("tier_2", [])
-        for card_name in all_selected_card_names:
-            if not card_name: continue
-            if any(x in card_name for x in ["Ignition", "Burning", "Flame"]): active_tags.add("Burn")
-            if any(x in card_name for x in ["Paralysis", "Paralyze"]): active_tags.add("Paralyze")
-            if any(x in card_name for x in ["Slow", "Stasis"]): active_tags.add("Slow")
-            if any(x in card_name for x in ["Stealth Reveal", "Ignition"]): active_tags.add("Stealth Reveal")
-
-    enemy_immunities = enemy.get('immunities', [])
-    enemy_tags = enemy.get('tags', [])
-    if "Paralysis" in enemy_immunities and "Paralyze" in active_tags:
-        score *= 0.1
-        notes.append("⛔ Immune: Paralysis")
-    if "Slow" in enemy_immunities and "Slow" in active_tags:
-        score *= 0.5
-        notes.append("⛔ Immune: Slow")
-    if "Projectile Block" in enemy_tags:
-        if "Projectile" in active_tags:
-            score *= 0.0
-            notes.append("❌ BLOCKED")
-        elif "Beam" in active_tags or "Lightning" in active_tags:
-            score *= 1.2
-            notes.append("✨ Bypasses Block")
-
-    is_weak = False
-    if tower['type'] in enemy.get('weakness_types', []): is_weak = True
-    for tag in active_tags:
-        if tag in enemy.get('weakness_types', []): is_weak = True
-    if is_weak:
-        score *= 1.5
-        notes.append("⚡ Weakness")
-
-    is_resist = False
-    if tower['type'] in enemy.get('resistance_types', []): is_resist = True
-    for tag in active_tags:
-        if tag in enemy.get('resistance_types', []): is_resist = True
-    if is_resist:
-        score *= 0.5
-        notes.append("🛡️ Resist")
-
-    if "Invisible" in enemy_tags or "Stealth" in enemy_tags:
-        if "Stealth Reveal" in active_tags:
-            score += 40
-            notes.append("👁️ Reveals")
-        elif "Area" in active_tags:
-            score += 10
-            notes.append("💥 AoE")
-        else:
-            score *= 0.6
-            notes.append("⚠️ Can't see")
-
-    if "Swarm" in enemy_tags or "Splitter" in enemy_tags:
-        if "Area" in active_tags or "Chain" in tower.get('role', ''):
-            score *= 1.2
-            notes.append("🌊 Anti-Swarm")
-        elif "Single Target" in tower.get('role', ''):
-            score *= 0.8
-            notes.append("⚠️ Overwhelmed")
-
-    return int(score), ", ".join(notes)
-
-def solve_optimal_loadout(wave_enemies, inventory_towers, mode_2vs1=False):
-    if len(inventory_towers) < 9:
-        return None, None, "Error: You need at least 9 towers in inventory to fill 3 waves!"
-
-    if len(wave_enemies) < 3:
-        return None, None, "Error: Wave data corrupted. Please reset in Setup."
-
-    setup_conditions = analyze_user_setup(st.session_state.card_setup)
-    scores_matrix = []
-    for enemy_id in wave_enemies:
-        wave_scores = {}
-        for t_id in inventory_towers:
-            s, _ = calculate_single_score(enemy_id, t_id)
-            wave_scores[t_id] = s
-        scores_matrix.append(wave_scores)
-
-    tower_utility = {}
-    for t_id in inventory_towers:
-        tower_utility[t_id] = sum(scores_matrix[w][t_id] for w in range(3))
-    top_9 = sorted(tower_utility.keys(), key=lambda x: tower_utility[x], reverse=True)[:9]
-
-    best_total = -float('inf')
-    best_allocation = None
-    best_wave_scores = []
-
-    # Helper function to calculate score for a tower set
-    def calculate_set_score(tower_set, wave_idx):
-        if wave_idx >= len(wave_enemies): return 0
-        enemy = enemies_db[wave_enemies[wave_idx]]
-        wave_score = sum(scores_matrix[wave_idx][t] for t in tower_set)
-        synergy_bonus = 0
-
-        for pair in combinations(tower_set, 2):
-            key = frozenset(pair)
-            if key in synergy_db:
-                for combo in synergy_db[key]:
-                    rating = combo.get('score', 5)
-                    combo_points = rating * 10
-                    tags = get_combo_tags(combo['description'], combo['name'])
-
-                    if any(t in enemy.get('weakness_types', []) for t in tags): combo_points *= 1.5
-                    if any(t in enemy.get('resistance_types', []) for t in tags): combo_points *= 0.5
-
-                    requires_burn = "burn" in combo['description'].lower()
-                    requires_slow = "slow" in combo['description'].lower()
-                    if requires_burn and "Burn" in setup_conditions: combo_points *= 1.4
-                    if requires_slow and "Slow" in setup_conditions: combo_points *= 1.3
-                    if "Vulnerable" in tags: wave_score *= 1.15
-
-                    synergy_bonus += combo_points
-
-        return wave_score + synergy_bonus
-
-    # Check if Tesla Coil has Matrix Thunderbolt setup (Trap Matrix + Enhanced Matrix)
-    has_tesla_matrix = has_matrix_thunderbolt_setup() and "tesla_coil" in inventory_towers
-
-    # When Tesla Matrix is available, it's ALWAYS preferred over normal 3x3
-    if has_tesla_matrix:
-        # Use Tesla Matrix configuration: 1 Tesla + 2 teams of 3
-        remaining_towers = [t for t in top_9 if t != "tesla_coil"]
-
-        if len(remaining_towers) >= 8:  # Need 8 other towers to pick best 6
-            # Try each wave position for the Tesla-only team
-            for tesla_wave_idx in range(3):
-                tesla_set = ("tesla_coil",)
-
-                # Try all combinations of 6 towers from the remaining 8
-                for towers_for_teams in combinations(remaining_towers, 6):
-                    # Try all ways to split these 6 towers into 2 teams of 3
-                    for team1 in combinations(towers_for_teams, 3):
-                        team2 = tuple(x for x in towers_for_teams if x not in team1)
-
-                        # Assign teams to waves based on tesla_wave_idx
-                        current_sets = [None, None, None]
-                        current_sets[tesla_wave_idx] = tesla_set
-
-                        # Fill the other two waves
-                        other_indices = [i for i in range(3) if i != tesla_wave_idx]
-                        current_sets[other_indices[0]] = team1
-                        current_sets[other_indices[1]] = team2
-
-                        current_wave_scores = [calculate_set_score(s, i) for i, s in enumerate(current_sets)]
-
-                        if mode_2vs1:
-                            optimization_metric = sum(sorted(current_wave_scores, reverse=True)[:2])
-                        else:
-                            optimization_metric = sum(current_wave_scores)
-
-                        if optimization_metric > best_total:
-                            best_total = optimization_metric
-                            best_allocation = current_sets
-                            best_wave_scores = current_wave_scores
-    else:
-        # Normal configuration: 3 teams of 3 towers each
-        for w1_set in combinations(top_9, 3):
-            remaining_6 = [x for x in top_9 if x not in w1_set]
-            for w2_set in combinations(remaining_6, 3):
-                w3_set = [x for x in remaining_6 if x not in w2_set]
-                current_sets = [w1_set, w2_set, tuple(w3_set)]
+    return get_score_engine().chains_text(tower_id)
 
-                current_wave_scores = [calculate_set_score(s, i) for i, s in enumerate(current_sets)]
-
-                if mode_2vs1:
-                    optimization_metric = sum(sorted(current_wave_scores, reverse=True)[:2])
-                else:
-                    optimization_metric = sum(current_wave_scores)
+@st.cache_resource(max_entries=32)
+def _compile_score_engine(card_setup_key):
+    return compile_score_engine(towers_db, enemies_db, card_index, json.loads(card_setup_key), get_disk_cache(DATA_VERSION),
+                                get_scoring_rules(DATA_VERSION))
 
-                if optimization_metric > best_total:
-                    best_total = optimization_metric
-                    best_allocation = current_sets
-                    best_wave_scores = current_wave_scores
+def get_score_engine():
+    """Compiled score matrix for the current card setup, shared across reruns"""
+    return _compile_score_engine(json.dumps(st.session_state.card_setup, sort_keys=True))
 
-    return best_allocation, best_wave_scores, None
+def calculate_single_score(enemy_id, tower_id):
+    return get_score_engine().score(enemy_id, tower_id)
+
+@st.cache_resource
+def get_result_cache():
+    """Process-wide solver result cache, shared by every session.
+    Bounded by GD_OPTIMIZER_CACHE_ENTRIES entries and optionally GD_OPTIMIZER_CACHE_MB megabytes."""
+    max_mb = float(os.environ.get("GD_OPTIMIZER_CACHE_MB", 0))
+    return ResultCache(max_entries=int(os.environ.get("GD_OPTIMIZER_CACHE_ENTRIES", 4096)),
+                       max_bytes=int(max_mb * 1024 * 1024) or None,
+                       backing=get_disk_cache(DATA_VERSION))
+
+@st.cache_resource
+def get_game_ids(version):
+    """Integer tower / enemy / card / tag ids and combo arrays, built once per data version"""
+    return GameIds(towers_db, enemies_db, card_index, get_scoring_rules(version))
+
+def get_optimizer(card_setup=None):
+    """Headless optimizer bound to this session's card setup, sharing the app-wide engine and cache"""
+    return Optimizer(towers_db, enemies_db, synergy_db, card_index, card_setup or st.session_state.card_setup,
+                     engine=get_score_engine(), cache=get_result_cache(), data_version=DATA_VERSION,
+                     ids=get_game_ids(DATA_VERSION))
+
+def iter_rank_loadouts(wave_enemies, inventory_towers, mode_2vs1=False, exact=False, top_k=1):
+    return get_optimizer().iter_rank_loadouts(wave_enemies, inventory_towers, mode_2vs1, exact, top_k)
+
+def lineup_lines(loadout):
+    """Markdown lines "Wave n: tower - tower - tower" for one allocation"""
+    return [f"**Wave {w+1}:** {' - '.join(towers_db[tid]['name'] for tid in team)}" for w, team in enumerate(loadout)]
+
+def weekly_query():
+    """(weekly enemies, available towers, exact) the sidebar's top teams are computed for"""
+    # Weekly enemies come from defaults, towers from the user's inventory
+    weekly_enemies = defaults.get('weekly_enemy_pool', [])
+    available_towers = list(st.session_state.get('user_towers', list(towers_db.keys())))
+    return weekly_enemies, available_towers, st.session_state.get('exact_solver', False)
+
+def weekly_run():
+    """This session's background weekly top teams computation (weekly_backend.BackgroundRun).
+    A run started for another inventory, card setup or solver is cancelled and replaced."""
+    weekly_enemies, available_towers, exact = weekly_query()
+    key = json.dumps([weekly_enemies, available_towers, st.session_state.card_setup, exact], sort_keys=True)
+    run = st.session_state.get('weekly_run')
+    if run is None or run.key != key:
+        if run is not None:
+            run.cancel()
+        # The worker thread gets its own copy of the card setup, widgets edit the session's in place
+        optimizer = get_optimizer(json.loads(json.dumps(st.session_state.card_setup)))
+        run = st.session_state.weekly_run = BackgroundRun(key, optimizer.iter_weekly_top_teams(weekly_enemies, available_towers, exact))
+    return run
+
+def weekly_top_teams_panel():
+    """Sidebar top teams. While the background run is going this is a fragment that polls
+    it every WEEKLY_POLL_S, so only the panel reruns and the rest of the page stays usable."""
+    run = weekly_run()
+    st.session_state.weekly_polling = run.running
+    st.fragment(_weekly_top_teams_fragment, run_every=WEEKLY_POLL_S if run.running else None)()
+
+def _weekly_top_teams_fragment():
+    run = weekly_run()
+    done, total, top_teams = run.progress
+    if run.running:
+        st.progress(done / total if total else 0.0, text=f"Solving wave combinations... {done:,}/{total:,}")
+        if top_teams:
+            st.caption("Partial results, updating as combinations are solved")
+    elif run.error is not None:
+        st.error(f"Weekly analysis failed: {run.error}")
+    else:
+        # Finished: a full rerun drops the polling timer
+        if st.session_state.get('weekly_polling'):
+            st.session_state.weekly_polling = False
+            st.rerun()
 
-def calculate_weekly_top_teams():
-    """Calculate the most frequently chosen tower teams across all wave combinations.
-    Accepts both normal 9-tower (3x3) and Tesla Matrix 7-tower (1+3+3) configurations."""
-    if 'weekly_top_teams' in st.session_state:
-        return st.session_state.weekly_top_teams
+    if top_teams:
+        for i, team in enumerate(top_teams, 1):
+            # Add Tesla-only indicator
+            team_label = f"Team {i}: {' - '.join(team['towers'])}"
+            if team.get('is_tesla_only', False):
+                team_label = f"⚡ Team {i}: {' - '.join(team['towers'])} (Solo)"
 
-    # Get weekly enemies from defaults
-    weekly_enemies = defaults.get('weekly_enemy_pool', [])
-    if not weekly_enemies:
-        return []
-
-    # Use user's inventory towers
-    available_towers = st.session_state.get('user_towers', list(towers_db.keys()))
-    if len(available_towers) < 7:  # Minimum 7 for Tesla Matrix mode
-        return []
-
-    # Count team appearances and track complete sets
-    team_counts = {}
-    team_effectiveness = {}
-    complete_sets = {}  # Track which 3-team sets (can be 7 or 9 towers)
-
-    # Generate all possible 3-wave combinations
-    for wave_combo in combinations(weekly_enemies, 3):
-        # Get optimal loadout for this wave combination
-        best_loadout, _, _ = solve_optimal_loadout(list(wave_combo), available_towers, mode_2vs1=False)
-
-        if best_loadout and len(best_loadout) == 3:
-            # Count total unique towers used
-            all_towers_used = set()
-            for team in best_loadout:
-                all_towers_used.update(team)
-
-            tower_count = len(all_towers_used)
-            # Accept both 9-tower (normal 3x3) and 7-tower (Tesla solo + 2x3) configurations
-            if tower_count == 9 or tower_count == 7:
-                # Create a key for the complete set (sorted for consistency)
-                sorted_teams = [tuple(sorted(team)) for team in best_loadout]
-                set_key = tuple(sorted(sorted_teams))  # Sort the 3 teams themselves
-
-                # Count this complete set
-                complete_sets[set_key] = complete_sets.get(set_key, 0) + 1
-
-                # Track which specific enemies each team was chosen for
-                for i, team in enumerate(best_loadout):
-                    team_key = tuple(sorted(team))
-                    team_counts[team_key] = team_counts.get(team_key, 0) + 1
-
-                    # Track which SPECIFIC enemy made the algorithm choose this team
-                    if team_key not in team_effectiveness:
-                        team_effectiveness[team_key] = {
-                            'specific_enemies': {},  # enemy_id -> count
-                            'wave_index': i
-                        }
-
-                    # The key insight: this team was chosen for this specific wave
-                    # So the specific enemy at position i is what this team is optimized for
-                    enemy_id = wave_combo[i]
-                    team_effectiveness[team_key]['specific_enemies'][enemy_id] = \
-                        team_effectiveness[team_key]['specific_enemies'].get(enemy_id, 0) + 1
-
-    # Find the most frequent complete set
-    if not complete_sets:
-        return []
-
-    # Get the most common complete set
-    best_complete_set = max(complete_sets.items(), key=lambda x: x[1])[0]
-
-    # Prepare results with the teams from the best complete set
-    top_teams = []
-    for team_key in best_complete_set:
-        effectiveness_data = team_effectiveness.get(team_key, {})
-        # Check if this is a Tesla-only team
-        is_tesla_only = team_key == ("tesla_coil",)
-        team_info = {
-            'towers': [towers_db[tid]['name'] for tid in team_key],
-            'tower_ids': list(team_key),
-            'count': team_counts.get(team_key, 0),
-            'effectiveness': effectiveness_data,
-            'wave_index': effectiveness_data.get('wave_index', 0),
-            'is_tesla_only': is_tesla_only
-        }
-        top_teams.append(team_info)
-
-    # Sort by wave index to maintain order
-    top_teams.sort(key=lambda x: x['wave_index'])
-
-    # Cache in session state
-    st.session_state.weekly_top_teams = top_teams
-
-    return top_teams
+            with st.expander(team_label, expanded=False):
+                # Show Tesla Matrix Thunderbolt indicator at the top
+                if team.get('is_tesla_only', False):
+                    st.success("⚡ **Matrix Thunderbolt Active** - Tesla Coil operates solo")
+
+                # Show team composition with colors
+                for tower_id in team['tower_ids']:
+                    if tower_id in towers_db:
+                        t = towers_db[tower_id]
+                        color = TYPE_COLORS.get(t['type'], '#fff')
+                        st.markdown(f"<span style='color:{color}'>●</span> <b>{t['name']}</b> ({t['type']})",
+                                    unsafe_allow_html=True)
+
+                # Show effectiveness against specific enemies this team was chosen for
+                specific_enemies = team['effectiveness'].get('specific_enemies', {})
+                if specific_enemies:
+                    # Sort by frequency (how often this team was chosen for this enemy)
+                    sorted_enemies = sorted(specific_enemies.items(), key=lambda x: x[1], reverse=True)
+                    top_enemies = [enemies_db[enemy_id]['name'] for enemy_id, count in sorted_enemies[:3]]
+
+                    if top_enemies:
+                        st.caption(f"🎯 Best vs: {', '.join(top_enemies)}")
+                        if len(sorted_enemies) > 3:
+                            st.caption(f"   Chosen for {len(sorted_enemies) - 3} other enemies")
+
+                        # Show a small indicator of how many times chosen
+                        if sorted_enemies[0][1] > 1:
+                            st.caption(f"   (Most chosen for {top_enemies[0]})")
+
+                # Show usage count
+                st.caption(f"📊 Chosen in {team['count']} combinations")
+    elif run.finished:
+        st.caption("No data available. Set up your inventory first.")
 
 # --- 5. VISUAL ASSETS ---
 def get_svg(icon_name, color):
@@ -497,6 +235,43 @@ def get_svg(icon_name, color):
     path = paths.get(icon_name, f'<circle cx="50" cy="50" r="30" fill="{color}"/>')
     return f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">{path}</svg>'
 
+def svg_data_uri(svg):
+    """URL-encoded data URI, about a quarter shorter than base64 for these small SVGs.
+    Quotes become single quotes so the URI fits in a double-quoted src attribute."""
+    return "data:image/svg+xml," + quote(svg.replace('"', "'"), safe=" '=:/,.-()")
+
+@st.cache_resource
+@timed("render.icons")
+def get_icon_css(version):
+    """One CSS rule per tower with its icon, in its type color, as a data-URI background.
+    Rendered once per data version; tiles reference it by class, so a page sends each
+    icon once however many tiles show it."""
+    return {t_id: f'.gd-icon-{t_id}{{background-image:url("{svg_data_uri(get_svg(t.get("icon", "beam"), TYPE_COLORS.get(t["type"], "#fff")))}")}}'
+            for t_id, t in towers_db.items()}
+
+def icon_styles(tower_ids):
+    """<style> block for the icons of tower_ids; goes in one markdown element per page"""
+    rules = get_icon_css(DATA_VERSION)
+    return "<style>" + ICON_BASE_CSS + "".join(rules[t] for t in dict.fromkeys(tower_ids)) + "</style>"
+
+@st.cache_resource
+def get_wave_tile_heads(version):
+    """Icon, name and type of each tower's Combat Calculator tile (the rest is per wave)"""
+    return {t_id: f'<div class="gd-icon gd-icon-{t_id}" style="width:40px; height:40px; flex:none;"></div>'
+                  f'<div><div style="font-weight:bold; color:#fff; font-size:0.95em;">{t["name"]}</div>'
+                  f'<div style="font-size:0.75em; color:{TYPE_COLORS.get(t["type"], "#fff")};">{t["type"]}</div></div>'
+            for t_id, t in towers_db.items()}
+
+@st.cache_resource
+def get_combo_tiles(version):
+    """Combo optimizer tower tiles; they depend only on the tower, so each is built once"""
+    return {t_id: f'<div style="text-align: center; padding: 10px;">'
+                  f'<div class="gd-icon gd-icon-{t_id}" style="width:60px; height:60px; margin: 0 auto;"></div>'
+                  f'<div style="font-weight: bold; margin-top: 5px;">{t["name"]}</div>'
+                  f'<div style="font-size: 0.9em; color: {TYPE_COLORS.get(t["type"], "#fff")};">{t["type"]}</div>'
+                  f'<div style="font-size: 0.8em; color: #888;">{t["role"]}</div></div>'
+            for t_id, t in towers_db.items()}
+
 # --- 6. PAGE: SETUP ---
 if st.session_state.page == 'setup':
     st.title("⚙️ Vanguard Mission Control")
@@ -509,7 +284,7 @@ if st.session_state.page == 'setup':
             save_user_config()
     with c_load:
         if st.button("🔄 Load Weekly Defaults", type="primary", use_container_width=True):
-            if os.path.exists(USER_CONFIG_FILE): os.remove(USER_CONFIG_FILE)
+            get_config_writer().delete()
             defs = load_defaults()
             valid_towers = [t for t in defs.get("available_towers", []) if t in towers_db]
             st.session_state.user_towers = valid_towers
@@ -544,9 +319,6 @@ if st.session_state.page == 'setup':
     def get_default_slot(tower_id, tier, slot_idx):
         try: return st.session_state.card_setup[tower_id][f"tier_{tier}"][slot_idx]
         except: return None
-    def get_opt_idx(options, item):
-        try: return options.index(item)
-        except: return 0
 
     for t_id in st.session_state.user_towers:
         t_data = towers_db[t_id]
@@ -554,16 +326,15 @@ if st.session_state.page == 'setup':
             st.session_state.card_setup[t_id] = {"tier_1": [], "tier_2": []}
             
         with st.expander(f"🃏 {t_data['name']} Configuration", expanded=False):
-            t1_opts = [c['name'] for c in cards_db.get(t_id, {}).get(1, [])]
-            t2_opts = [c['name'] for c in cards_db.get(t_id, {}).get(2, [])]
-            all_opts = sorted(list(set(t1_opts + t2_opts)))
+            all_opts = card_index.slot_options.get(t_id, [])
+            opt_pos = card_index.slot_position.get(t_id, {})
             
             st.markdown("**Tier 1 Slots**")
             cols_t1 = st.columns(4)
             current_t1 = []
             for i in range(4):
                 with cols_t1[i]:
-                    idx = get_opt_idx(all_opts, get_default_slot(t_id, 1, i))
+                    idx = opt_pos.get(get_default_slot(t_id, 1, i), 0)
                     val = st.selectbox(f"T1-{i+1}", options=all_opts, index=idx, key=f"{t_id}_t1_{i}", label_visibility="collapsed")
                     current_t1.append(val)
             st.session_state.card_setup[t_id]["tier_1"] = current_t1
@@ -573,7 +344,7 @@ if st.session_state.page == 'setup':
             current_t2 = []
             for i in range(4):
                 with cols_t2[i]:
-                    idx = get_opt_idx(all_opts, get_default_slot(t_id, 2, i))
+                    idx = opt_pos.get(get_default_slot(t_id, 2, i), 0)
                     val = st.selectbox(f"T2-{i+1}", options=all_opts, index=idx, key=f"{t_id}_t2_{i}", label_visibility="collapsed")
                     current_t2.append(val)
             st.session_state.card_setup[t_id]["tier_2"] = current_t2
@@ -610,6 +381,25 @@ elif st.session_state.page == 'main':
                                 help="Maximize chances of winning 2 rounds, ignoring the score of the weakest round.",
                                 on_change=save_user_config)
         st.session_state.mode_2vs1 = mode_2vs1
+
+        solve_budget_ms = st.number_input("⏱️ Time Budget (ms)", min_value=0, max_value=10_000, step=50,
+                                          value=int(st.session_state.solve_budget_ms),
+                                          help="Anytime search of the full inventory that stops after this long and "
+                                               "reports how far the answer can be from the best possible. 0 = off.",
+                                          on_change=save_user_config)
+        st.session_state.solve_budget_ms = solve_budget_ms
+        if solve_budget_ms:
+            st.caption(f"Time budget on: the full inventory is searched, exactly up to {EXACT_BOUND_TOWERS} towers "
+                       "when the budget allows; the Exact Solver switch is not used.")
+
+        exact_solver = st.checkbox("Exact Solver",
+                                   value=st.session_state.exact_solver,
+                                   disabled=bool(st.session_state.solve_budget_ms),
+                                   help="Search every tower in the inventory instead of only the 9 with the best summed score. "
+                                        "Finds the provably best lineup. Not used with a time budget, which always "
+                                        "searches the full inventory.",
+                                   on_change=save_user_config)
+        st.session_state.exact_solver = exact_solver
         
         if st.button("⚙️ Edit Weekly Setup", use_container_width=True):
             st.session_state.page = 'setup'
@@ -627,49 +417,7 @@ elif st.session_state.page == 'main':
         st.markdown("### 💡 This Week's Top Teams")
         st.caption("Most chosen teams across all wave combinations")
 
-        # Calculate and display top teams
-        top_teams = calculate_weekly_top_teams()
-
-        if top_teams:
-            for i, team in enumerate(top_teams, 1):
-                # Add Tesla-only indicator
-                team_label = f"Team {i}: {' - '.join(team['towers'])}"
-                if team.get('is_tesla_only', False):
-                    team_label = f"⚡ Team {i}: {' - '.join(team['towers'])} (Solo)"
-
-                with st.expander(team_label, expanded=False):
-                    # Show Tesla Matrix Thunderbolt indicator at the top
-                    if team.get('is_tesla_only', False):
-                        st.success("⚡ **Matrix Thunderbolt Active** - Tesla Coil operates solo")
-
-                    # Show team composition with colors
-                    for tower_id in team['tower_ids']:
-                        if tower_id in towers_db:
-                            t = towers_db[tower_id]
-                            color = TYPE_COLORS.get(t['type'], '#fff')
-                            st.markdown(f"<span style='color:{color}'>●</span> <b>{t['name']}</b> ({t['type']})",
-                                        unsafe_allow_html=True)
-
-                    # Show effectiveness against specific enemies this team was chosen for
-                    specific_enemies = team['effectiveness'].get('specific_enemies', {})
-                    if specific_enemies:
-                        # Sort by frequency (how often this team was chosen for this enemy)
-                        sorted_enemies = sorted(specific_enemies.items(), key=lambda x: x[1], reverse=True)
-                        top_enemies = [enemies_db[enemy_id]['name'] for enemy_id, count in sorted_enemies[:3]]
-
-                        if top_enemies:
-                            st.caption(f"🎯 Best vs: {', '.join(top_enemies)}")
-                            if len(sorted_enemies) > 3:
-                                st.caption(f"   Chosen for {len(sorted_enemies) - 3} other enemies")
-
-                            # Show a small indicator of how many times chosen
-                            if sorted_enemies[0][1] > 1:
-                                st.caption(f"   (Most chosen for {top_enemies[0]})")
-
-                    # Show usage count
-                    st.caption(f"📊 Chosen in {team['count']} combinations")
-        else:
-            st.caption("No data available. Set up your inventory first.")
+        weekly_top_teams_panel()
 
         st.divider()
 
@@ -680,175 +428,199 @@ elif st.session_state.page == 'main':
 
     st.title("🛡️ Vanguard Strategy Engine")
     
-    pool_options = st.session_state.weekly_enemy_pool
+    # Rerun scopes: the sidebar settings (mode, exact, budget) and navigation feed every
+    # part of the page and rerun it all. A wave pick only feeds the lineup and the wave
+    # cards, so pickers, lineup and cards form one fragment and a wave change reruns just
+    # that; the sidebar, its weekly panel (own polling fragment) and inventory stay as drawn.
+    @st.fragment
+    def combat_calculator():
+        pool_options = st.session_state.weekly_enemy_pool
     
-    if not pool_options:
-        st.error("No enemies defined! Please go to Setup.")
-        if st.button("Go to Setup"):
-            st.session_state.page = 'setup'
-            st.rerun()
-    else:
-        cols = st.columns(3)
-        enemy_fmt = lambda x: f"{'👑' if enemies_db[x]['type'] == 'Boss' else '👾'} {enemies_db[x]['name']}"
+        if not pool_options:
+            st.error("No enemies defined! Please go to Setup.")
+            if st.button("Go to Setup"):
+                st.session_state.page = 'setup'
+                st.rerun()
+        else:
+            cols = st.columns(3)
+            enemy_fmt = lambda x: f"{'👑' if enemies_db[x]['type'] == 'Boss' else '👾'} {enemies_db[x]['name']}"
         
-        for i, col in enumerate(cols):
-            with col:
-                current_val = st.session_state.active_waves[i]
-                try: idx = pool_options.index(current_val)
-                except: idx = 0
-                sel = st.selectbox(f"Wave {i+1}", options=pool_options, index=idx, format_func=enemy_fmt, key=f"w{i}", on_change=save_user_config)
-                st.session_state.active_waves[i] = sel
-
-        st.divider()
+            for i, col in enumerate(cols):
+                with col:
+                    current_val = st.session_state.active_waves[i]
+                    try: idx = pool_options.index(current_val)
+                    except: idx = 0
+                    sel = st.selectbox(f"Wave {i+1}", options=pool_options, index=idx, format_func=enemy_fmt, key=f"w{i}", on_change=save_user_config)
+                    st.session_state.active_waves[i] = sel
+
+            st.divider()
+
+            # WRAP CALCULATION IN TRY/EXCEPT BLOCK
+            try:
+                anytime = None
+                if st.session_state.solve_budget_ms:
+                    lineups, error, anytime = get_optimizer().anytime_loadouts(
+                        st.session_state.active_waves,
+                        st.session_state.user_towers,
+                        mode_2vs1=st.session_state.mode_2vs1,
+                        top_k=ALTERNATIVE_LINEUPS,
+                        budget_s=st.session_state.solve_budget_ms / 1000)
+                else:
+                    # Stream best-so-far lineups while the search runs; the final one renders below
+                    live = st.empty()
+                    for lineups, error, done, total in iter_rank_loadouts(
+                            st.session_state.active_waves,
+                            st.session_state.user_towers,
+                            mode_2vs1=st.session_state.mode_2vs1,
+                            exact=st.session_state.exact_solver,
+                            top_k=ALTERNATIVE_LINEUPS):
+                        if done < total and lineups:
+                            live.info(f"⏳ Searching ({done}/{total}), best so far:\n\n" + "\n\n".join(lineup_lines(lineups[0][0])))
+                    live.empty()
+                best_loadout, wave_scores = lineups[0] if lineups else (None, [])
+                setup_conditions = analyze_user_setup(card_index, st.session_state.card_setup)
+                tile_heads = get_wave_tile_heads(DATA_VERSION)
+
+                if error:
+                    st.error(error)
+                elif not best_loadout:
+                    st.warning("⚠️ No valid loadout found. Please check your Inventory settings.")
+                else:
+                    sacrifice_idx = -1
+                    if st.session_state.mode_2vs1 and wave_scores:
+                        sacrifice_idx = wave_scores.index(min(wave_scores))
 
-        # WRAP CALCULATION IN TRY/EXCEPT BLOCK
-        try:
-            with st.spinner("Analyzing data..."):
-                best_loadout, wave_scores, error = solve_optimal_loadout(
-                    st.session_state.active_waves, 
-                    st.session_state.user_towers, 
-                    mode_2vs1=st.session_state.mode_2vs1
-                )
-
-            if error:
-                st.error(error)
-            elif not best_loadout:
-                st.warning("⚠️ No valid loadout found. Please check your Inventory settings.")
-            else:
-                sacrifice_idx = -1
-                if st.session_state.mode_2vs1 and wave_scores:
-                    sacrifice_idx = wave_scores.index(min(wave_scores))
-
-                st.subheader("📋 Mission Briefing")
-                
-                # Check list lengths
-                if len(best_loadout) == 3:
-                    # Check for Tesla Matrix Thunderbolt teams
-                    has_tesla_only = any(len(team) == 1 and team[0] == "tesla_coil" for team in best_loadout)
-
-                    line1 = f"**Wave 1:** {' - '.join([towers_db[tid]['name'] for tid in best_loadout[0]])}"
-                    line2 = f"**Wave 2:** {' - '.join([towers_db[tid]['name'] for tid in best_loadout[1]])}"
-                    line3 = f"**Wave 3:** {' - '.join([towers_db[tid]['name'] for tid in best_loadout[2]])}"
-
-                    if has_tesla_only:
-                        st.info(f"💡 **Quick Lineup:** (⚡ Tesla Matrix Thunderbolt Active)\n\n{line1}\n\n{line2}\n\n{line3}")
-                    else:
-                        st.info(f"💡 **Quick Lineup:**\n\n{line1}\n\n{line2}\n\n{line3}")
+                    st.subheader("📋 Mission Briefing")
                 
-                st.divider()
+                    # Check list lengths
+                    if len(best_loadout) == 3:
+                        # Check for Tesla Matrix Thunderbolt teams
+                        has_tesla_only = any(len(team) == 1 and team[0] == "tesla_coil" for team in best_loadout)
 
-                for i, enemy_id in enumerate(st.session_state.active_waves):
-                    if i >= len(best_loadout): break
-                    enemy = enemies_db[enemy_id]
-                    wave_towers = best_loadout[i]
+                        line1, line2, line3 = lineup_lines(best_loadout)
 
-                    is_sacrifice = (i == sacrifice_idx)
-                    is_tesla_only = len(wave_towers) == 1 and wave_towers[0] == "tesla_coil"
-
-                    with st.container(border=True):
-                        c_head, c_tags = st.columns([1, 2])
-                        with c_head:
-                            header_text = f"#### Wave {i+1}: {enemy['name']}"
-                            if is_tesla_only:
-                                st.markdown(f"#### ⚡ Wave {i+1}: TESLA MATRIX THUNDERBOLT")
-                                st.caption(f"Enemy: {enemy['name']} (Solo Mode)")
-                            elif is_sacrifice:
-                                st.markdown(f"#### 💀 Wave {i+1}: SACRIFICIAL TEAM")
-                                st.caption(f"Enemy: {enemy['name']} (Expected Loss)")
-                            else:
-                                st.markdown(header_text)
-                                st.caption(f"Faction: {enemy['faction']}")
-                        with c_tags:
-                            tags = [f"`{t}`" for t in enemy.get('tags', [])]
-                            if tags: st.markdown(" ".join(tags))
-                            weak = enemy.get('weakness_types', [])
-                            if weak: st.markdown(f"⚡ **Weak:** {', '.join(weak)}")
-                            res = enemy.get('resistance_types', [])
-                            if res: st.markdown(f"🛡️ **Resist:** {', '.join(res)}")
-
-                        st.divider()
-
-                        active_combos = []
-                        for pair in combinations(wave_towers, 2):
-                            key = frozenset(pair)
-                            if key in synergy_db:
-                                for c in synergy_db[key]:
-                                    active_combos.append(c)
+                        if has_tesla_only:
+                            st.info(f"💡 **Quick Lineup:** (⚡ Tesla Matrix Thunderbolt Active)\n\n{line1}\n\n{line2}\n\n{line3}")
+                        else:
+                            st.info(f"💡 **Quick Lineup:**\n\n{line1}\n\n{line2}\n\n{line3}")
+
+                        if anytime:
+                            st.caption("✅ Provably best lineup" if anytime['optimal'] else
+                                       f"⏱️ Within {anytime['gap']:.1%} of a loose upper bound ({anytime['bound']:.0f}: every "
+                                       f"wave's best team, shared towers ignored) · "
+                                       f"{anytime['evaluations']:,} lineups in {anytime['elapsed_s'] * 1000:.0f} ms")
+
+                        # Runner-up lineups, scored with the same metric as the solver
+                        if len(lineups) > 1:
+                            best_metric = lineup_metric(wave_scores, st.session_state.mode_2vs1)
+                            with st.expander(f"🔀 Alternative Lineups ({len(lineups) - 1})", expanded=False):
+                                for rank, (alt_loadout, alt_scores) in enumerate(lineups[1:], 2):
+                                    alt_metric = lineup_metric(alt_scores, st.session_state.mode_2vs1)
+                                    st.markdown(f"**#{rank}** · Score {alt_metric:.0f} ({alt_metric - best_metric:+.0f})")
+                                    st.caption("  \n".join(
+                                        f"Wave {w+1}: {' - '.join(towers_db[tid]['name'] for tid in team)}"
+                                        for w, team in enumerate(alt_loadout)))
+                
+                    st.divider()
+
+                    for i, enemy_id in enumerate(st.session_state.active_waves):
+                        if i >= len(best_loadout): break
+                        enemy = enemies_db[enemy_id]
+                        wave_towers = best_loadout[i]
+
+                        is_sacrifice = (i == sacrifice_idx)
+                        is_tesla_only = len(wave_towers) == 1 and wave_towers[0] == "tesla_coil"
+
+                        with st.container(border=True):
+                            c_head, c_tags = st.columns([1, 2])
+                            with c_head:
+                                header_text = f"#### Wave {i+1}: {enemy['name']}"
+                                if is_tesla_only:
+                                    st.markdown(f"#### ⚡ Wave {i+1}: TESLA MATRIX THUNDERBOLT")
+                                    st.caption(f"Enemy: {enemy['name']} (Solo Mode)")
+                                elif is_sacrifice:
+                                    st.markdown(f"#### 💀 Wave {i+1}: SACRIFICIAL TEAM")
+                                    st.caption(f"Enemy: {enemy['name']} (Expected Loss)")
+                                else:
+                                    st.markdown(header_text)
+                                    st.caption(f"Faction: {enemy['faction']}")
+                            with c_tags:
+                                tags = [f"`{t}`" for t in enemy.get('tags', [])]
+                                if tags: st.markdown(" ".join(tags))
+                                weak = enemy.get('weakness_types', [])
+                                if weak: st.markdown(f"⚡ **Weak:** {', '.join(weak)}")
+                                res = enemy.get('resistance_types', [])
+                                if res: st.markdown(f"🛡️ **Resist:** {', '.join(res)}")
+
+                            st.divider()
+
+                            active_combos = []
+                            for pair in combinations(wave_towers, 2):
+                                key = frozenset(pair)
+                                if key in synergy_db:
+                                    for c in synergy_db[key]:
+                                        active_combos.append(c)
                         
-                        if active_combos:
-                            st.markdown("**🔗 Potential Combos:**")
-                            for c in active_combos:
-                                rating = c.get('score', 5)
-                                desc = c['description']
-                                tags = get_combo_tags(desc, c['name'])
+                            if active_combos:
+                                st.markdown("**🔗 Potential Combos:**")
+                                for c in active_combos:
+                                    rating = c.get('score', 5)
+                                    desc = c['description']
+                                    tags = card_index.combo_tags(c)
                                 
-                                badges = []
-                                if any(t in enemy.get('weakness_types', []) for t in tags): badges.append("⚡ Super Effective")
-                                if any(t in enemy.get('resistance_types', []) for t in tags): badges.append("🛡️ Resisted")
+                                    badges = []
+                                    if any(t in enemy.get('weakness_types', []) for t in tags): badges.append("⚡ Super Effective")
+                                    if any(t in enemy.get('resistance_types', []) for t in tags): badges.append("🛡️ Resisted")
                                 
-                                setup_conditions = analyze_user_setup(st.session_state.card_setup)
-                                if "burn" in desc.lower() and "Burn" in setup_conditions: badges.append("🔥 Guaranteed Trigger")
-                                if "slow" in desc.lower() and "Slow" in setup_conditions: badges.append("❄️ Guaranteed Trigger")
+                                    if "burn" in desc.lower() and "Burn" in setup_conditions: badges.append("🔥 Guaranteed Trigger")
+                                    if "slow" in desc.lower() and "Slow" in setup_conditions: badges.append("❄️ Guaranteed Trigger")
                                 
-                                badge_str = " ".join([f"`{b}`" for b in badges])
-                                color = "green" if rating >= 8 else "orange"
+                                    badge_str = " ".join([f"`{b}`" for b in badges])
+                                    color = "green" if rating >= 8 else "orange"
                                 
-                                st.markdown(f"- :{color}[**{c['name']}**] ({rating}/10) {badge_str}")
-                                st.caption(f"└ {desc}")
-                            st.markdown("")
-
-                        # Adjust column layout based on team size
-                        if is_tesla_only:
-                            # Tesla-only team: single centered display
-                            t_cols = st.columns([1, 2, 1])
-                            display_col = t_cols[1]
-                        else:
-                            # Normal team: 3 columns
-                            t_cols = st.columns(3)
-
-                        sorted_towers = sorted(wave_towers, key=lambda tid: calculate_single_score(enemy_id, tid)[0], reverse=True)
-
-                        for idx, t_id in enumerate(sorted_towers):
-                            # For Tesla-only, always use center column; for normal, use indexed columns
-                            target_col = display_col if is_tesla_only else t_cols[idx]
-                            with target_col:
-                                t_data = towers_db[t_id]
-                                score, note = calculate_single_score(enemy_id, t_id)
-                                color = TYPE_COLORS.get(t_data['type'], "#fff")
-                                icon_svg = get_svg(t_data.get('icon', 'beam'), color)
-                                b64_svg = base64.b64encode(icon_svg.encode('utf-8')).decode("utf-8")
-
-                                active_chains = get_active_chains_text(t_id)
-
-                                # Add special styling for Tesla with Matrix Thunderbolt
-                                border_style = "2px solid #ffd700" if is_tesla_only and t_id == "tesla_coil" else "1px solid #333"
-                                bg_style = "#2a2a1a" if is_tesla_only and t_id == "tesla_coil" else "#1e1e1e"
-
-                                html_code = textwrap.dedent(f"""
-                                <div style="background-color: {bg_style}; border: {border_style}; border-radius: 6px; padding: 10px;">
-                                    <div style="display: flex; align-items: center; gap: 10px;">
-                                        <img src="data:image/svg+xml;base64,{b64_svg}" style="width:40px; height:40px;">
-                                        <div>
-                                            <div style="font-weight:bold; color:#fff; font-size:0.95em;">{t_data['name']}</div>
-                                            <div style="font-size:0.75em; color:{color};">{t_data['type']}</div>
-                                        </div>
-                                        <div style="margin-left:auto; text-align:right;">
-                                            <div style="font-weight:bold; font-size:1.1em; color:#ddd;">{score}</div>
-                                        </div>
-                                    </div>
-                                    <div style="margin-top:6px;">
-                                        {f'<div style="font-size:0.75em; color:#ffd700; margin-bottom:2px;">⚡ Matrix Thunderbolt: {active_chains}</div>' if active_chains and is_tesla_only else (f'<div style="font-size:0.75em; color:#4ea8de; margin-bottom:2px;">{active_chains}</div>' if active_chains else '')}
-                                        <div style="font-size:0.7em; color:#aaa; line-height:1.2;">{note}</div>
-                                    </div>
-                                </div>
-                                """)
-                                st.markdown(html_code, unsafe_allow_html=True)
+                                    st.markdown(f"- :{color}[**{c['name']}**] ({rating}/10) {badge_str}")
+                                    st.caption(f"└ {desc}")
+                                st.markdown("")
+
+                            # Adjust column layout based on team size
+                            if is_tesla_only:
+                                # Tesla-only team: single centered display
+                                t_cols = st.columns([1, 2, 1])
+                                display_col = t_cols[1]
+                            else:
+                                # Normal team: 3 columns
+                                t_cols = st.columns(3)
+
+                            sorted_towers = sorted(wave_towers, key=lambda tid: calculate_single_score(enemy_id, tid)[0], reverse=True)
+
+                            for idx, t_id in enumerate(sorted_towers):
+                                # For Tesla-only, always use center column; for normal, use indexed columns
+                                target_col = display_col if is_tesla_only else t_cols[idx]
+                                with target_col:
+                                    score, note = calculate_single_score(enemy_id, t_id)
+                                    active_chains = get_active_chains_text(t_id)
+
+                                    # Add special styling for Tesla with Matrix Thunderbolt
+                                    border_style = "2px solid #ffd700" if is_tesla_only and t_id == "tesla_coil" else "1px solid #333"
+                                    bg_style = "#2a2a1a" if is_tesla_only and t_id == "tesla_coil" else "#1e1e1e"
+
+                                    chain_line = ""
+                                    if active_chains:
+                                        chain_line = (f'<div style="font-size:0.75em; color:#ffd700; margin-bottom:2px;">⚡ Matrix Thunderbolt: {active_chains}</div>' if is_tesla_only
+                                                      else f'<div style="font-size:0.75em; color:#4ea8de; margin-bottom:2px;">{active_chains}</div>')
+                                    html_code = (f'<div style="background-color: {bg_style}; border: {border_style}; border-radius: 6px; padding: 10px;">'
+                                                 f'<div style="display: flex; align-items: center; gap: 10px;">{tile_heads[t_id]}'
+                                                 f'<div style="margin-left:auto; text-align:right;"><div style="font-weight:bold; font-size:1.1em; color:#ddd;">{score}</div></div></div>'
+                                                 f'<div style="margin-top:6px;">{chain_line}<div style="font-size:0.7em; color:#aaa; line-height:1.2;">{note}</div></div></div>')
+                                    st.markdown(html_code, unsafe_allow_html=True)
                 
-                st.markdown("<br><br>", unsafe_allow_html=True)
+                    st.markdown(icon_styles(t for team in best_loadout for t in team) + "<br><br>", unsafe_allow_html=True)
                 
-        except Exception as e:
-            st.error(f"⚠️ Calculation Error: {str(e)}")
-            st.caption("Try going back to Setup and resetting defaults.")
+            except Exception as e:
+                st.error(f"⚠️ Calculation Error: {str(e)}")
+                st.caption("Try going back to Setup and resetting defaults.")
+
+    combat_calculator()
 
 # --- 8. PAGE: COMBO OPTIMIZER ---
 elif st.session_state.page == 'combo_optimizer':
@@ -876,7 +648,7 @@ elif st.session_state.page == 'combo_optimizer':
 
     # Initialize optimizer
     if 'combo_optimizer' not in st.session_state:
-        st.session_state.combo_optimizer = ComboOptimizer(towers_db, enemies_db, synergy_db, cards_db)
+        st.session_state.combo_optimizer = ComboOptimizer(towers_db, enemies_db, synergy_db, cards_db, card_index)
 
     optimizer = st.session_state.combo_optimizer
 
@@ -902,38 +674,50 @@ elif st.session_state.page == 'combo_optimizer':
             help="Prefer towers with specific damage type"
         )
 
+    combo_budget_ms = st.number_input("⏱️ Time Budget (ms)", min_value=0, max_value=10_000, step=50, value=0,
+                                      help="Local search instead of scoring every combination, for large tower "
+                                           "lists. 0 = score all.")
+
     # Optimization button
     if st.button("🔍 Find Best Combinations", type="primary"):
-        with st.spinner("Analyzing tower combinations..."):
-            results = optimizer.get_best_combinations(
-                enemy_type=enemy_type if enemy_type != "Any" else None,
-                damage_preference=damage_preference if damage_preference != "Any" else None,
-                top_n=10
-            )
+        filters = dict(enemy_type=enemy_type if enemy_type != "Any" else None,
+                       damage_preference=damage_preference if damage_preference != "Any" else None,
+                       top_n=10)
+        anytime = None
+        if combo_budget_ms:
+            results, anytime = optimizer.anytime_best_combinations(**filters, budget_s=combo_budget_ms / 1000)
+        else:
+            # Stream the leaders while the candidates are scored, then render the final list
+            live = st.empty()
+            results = []
+            for done, total, results in optimizer.iter_best_combinations(**filters):
+                if done < total:
+                    with live.container():
+                        st.progress(done / total, text=f"Analyzing tower combinations... {done:,}/{total:,}")
+                        for i, combo in enumerate(results[:3], 1):
+                            st.caption(f"#{i} · {combo['total_score']:.0f} · "
+                                       + " - ".join(towers_db[t]['name'] for t in combo['towers']))
+            live.empty()
 
         # Display results
         st.success(f"Found {len(results)} optimal combinations!")
-        st.markdown("---")
-
+        if anytime:
+            st.caption(f"✅ Every combination scored ({anytime['evaluations']:,} in "
+                       f"{anytime['elapsed_s'] * 1000:.0f} ms), so this list is exact" if anytime['bound_exact'] else
+                       "✅ Best found meets the upper bound" if anytime['optimal'] else
+                       f"⏱️ Best found is within {anytime['gap']:.1%} of a loose upper bound ({anytime['bound']:.0f}: "
+                       f"each tower's value plus half its three best partners) · "
+                       f"{anytime['evaluations']:,} swaps in {anytime['elapsed_s'] * 1000:.0f} ms")
+        st.markdown(icon_styles(t for combo in results for t in combo['towers']) + "\n\n---", unsafe_allow_html=True)
+
+        combo_tiles = get_combo_tiles(DATA_VERSION)
         for i, combo in enumerate(results, 1):
             with st.expander(f"#{i} - Score: {combo['total_score']:.0f}", expanded=i <= 3):
                 # Tower selection
                 cols = st.columns(5)
                 for j, tower_id in enumerate(combo['towers']):
                     with cols[j]:
-                        tower = towers_db[tower_id]
-                        color = TYPE_COLORS.get(tower['type'], '#fff')
-                        icon_svg = get_svg(tower.get('icon', 'beam'), color)
-                        b64_svg = base64.b64encode(icon_svg.encode('utf-8')).decode("utf-8")
-
-                        st.markdown(f"""
-                        <div style="text-align: center; padding: 10px;">
-                            <img src="data:image/svg+xml;base64,{b64_svg}" style="width:60px; height:60px; display: block; margin: 0 auto;">
-                            <div style="font-weight: bold; margin-top: 5px;">{tower['name']}</div>
-                            <div style="font-size: 0.9em; color: {color};">{tower['type']}</div>
-                            <div style="font-size: 0.8em; color: #888;">{tower['role']}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        st.markdown(combo_tiles[tower_id], unsafe_allow_html=True)
 
                 # Score breakdown
                 score_data = combo['score_breakdown']
@@ -987,3 +771,28 @@ elif st.session_state.page == 'combo_optimizer':
 
                 st.markdown("---")
             
+
+# --- 9. DEVELOPER PANEL ---
+profiling.record("app.run", time.perf_counter() - _run_started)
+with st.sidebar:
+    st.divider()
+    if st.checkbox("🛠️ Developer Panel", key="dev_panel", help="Timing spans and counters since the server started (all sessions)"):
+        stats = profiling.snapshot()
+        st.caption("Spans (slowest total first)")
+        st.dataframe([{"span": name, **row} for name, row in stats['spans'].items()], hide_index=True)
+        st.caption("Counters")
+        st.dataframe([{"counter": name, "value": value} for name, value in stats['counters'].items()], hide_index=True)
+        st.caption("Shared result cache")
+        stats['result_cache'] = get_result_cache().stats()
+        st.dataframe([{"stat": name, "value": str(value)} for name, value in stats['result_cache'].items()], hide_index=True)
+        disk = get_disk_cache(DATA_VERSION)
+        if disk is not None:
+            st.caption("Disk cache")
+            stats['disk_cache'] = disk.stats()
+            st.dataframe([{"stat": name, "value": str(value)} for name, value in stats['disk_cache'].items()], hide_index=True)
+        c_reset, c_dl = st.columns(2)
+        if c_reset.button("Reset", use_container_width=True):
+            profiling.reset()
+            st.rerun()
+        c_dl.download_button("JSON", json.dumps(stats, indent=2), file_name="profile.json",
+                             mime="application/json", use_container_width=True)
@@ -0,0 +1,238 @@
+"""Timing and peak-memory benchmarks for the solver entry points on synthetic data.
+
+    python benchmark.py                                   # all sizes, results to benchmark_results.json
+    python benchmark.py --sizes small,medium --repeat 5
+    python benchmark.py --output new.json --compare benchmark_results.json
+
+Synthetic towers / enemies / cards follow the shape of data/*.json, so every
+scoring rule, combo, chain group and the Tesla Matrix path gets exercised."""
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+
+from combo_optimizer import ComboOptimizer
+from optimizer_core import Optimizer, build_game_data
+from score_engine import ScoreEngine
+from scoring_rules import load_scoring_rules
+from solve_cache import ResultCache
+
+# name -> (towers, enemies, cards per tower, weekly pool size)
+SIZES = {
+    "small": (12, 50, 18, 8),
+    "medium": (20, 100, 24, 10),
+    "large": (30, 200, 30, 12),
+    # C(16, 3) = 560 weekly triples, past weekly_backend.MIN_PARALLEL_JOBS, so the worker pool runs
+    "xlarge": (30, 200, 30, 16),
+}
+
+TOWER_TYPES = ["Physical", "Fire", "Electric", "Energy", "Force-field"]
+ROLES = ["Core", "Single Target", "AoE", "Chain", "Control", "Support", "Sniper", "Summon"]
+DAMAGE_TAGS = ["Bullet", "Physical", "Projectile", "Beam", "Laser", "Lightning", "Electric", "Shock",
+               "Burn", "Fire", "Explosion", "Energy", "Force-field", "Pull", "Slow", "Paralyze", "Area"]
+ENEMY_TAGS = ["Swarm", "Splitter", "Stealth", "Invisible", "Projectile Block", "Flying", "Tank",
+              "Shielded", "Fast", "Healer", "Massive", "Armored"]
+IMMUNITIES = ["Paralysis", "Slow", "Burn", "Knockback"]
+AFFINITIES = ["Physical", "Fire", "Electric", "Energy", "Force-field", "Projectile", "Explosion"]
+# Name / description fragments the keyword rules react to
+CARD_WORDS = ["Ignition", "Flame", "Paralysis", "Slow", "Stasis", "Vulnerable", "Shock", "Laser",
+              "Bullet", "Mine", "Thunder", "Pull", "Refraction", "Impact", "Mark", "Surge"]
+
+
+def synthetic_data(n_towers, n_enemies, cards_per_tower, seed=0):
+    """Raw (towers, enemies, cards) JSON-shaped data. Always contains guardian and tesla_coil."""
+    rng = random.Random(seed)
+    tower_ids = ["guardian", "tesla_coil"] + [f"tower_{i:03d}" for i in range(n_towers - 2)]
+
+    towers = {}
+    for tid in tower_ids:
+        ttype = rng.choice(TOWER_TYPES)
+        towers[tid] = {
+            "name": tid.replace("_", " ").title(),
+            "type": ttype,
+            "role": rng.choice(ROLES),
+            "damage_tags": sorted(set(rng.sample(DAMAGE_TAGS, rng.randint(2, 4))) | {ttype}),
+            "icon": "default",
+        }
+
+    enemies = []
+    for i in range(n_enemies):
+        enemies.append({
+            "id": f"enemy_{i:03d}",
+            "name": f"Enemy {i}",
+            "type": rng.choice(["Normal", "Elite", "Boss"]),
+            "faction": "Synthetic",
+            "description": "",
+            "weakness_types": rng.sample(AFFINITIES, rng.randint(0, 2)),
+            "resistance_types": rng.sample(AFFINITIES, rng.randint(0, 2)),
+            "immunities": rng.sample(IMMUNITIES, rng.randint(0, 1)),
+            "tags": rng.sample(ENEMY_TAGS, rng.randint(0, 3)),
+        })
+
+    cards = []
+    for tid in tower_ids:
+        groups = [f"{tid} Chain {g}" for g in range(2)]
+        for k in range(cards_per_tower):
+            tier = 1 + k * 3 // cards_per_tower
+            word = rng.choice(CARD_WORDS)
+            card = {"tower_id": tid, "tier": tier, "name": f"{word} {tid} {k}",
+                    "description": f"{rng.choice(CARD_WORDS)} effect on hit.", "score": rng.randint(5, 10)}
+            kind = k % 4
+            if kind == 0:
+                card.update(type="Chain", chain_group=rng.choice(groups), chain_step=tier)
+            elif kind == 1:
+                card.update(type="Combo", combo_partner=rng.choice([t for t in tower_ids if t != tid]),
+                            partner_tier_req=tier)
+            else:
+                card["type"] = "Normal" if kind == 2 else "Breakthrough"
+            cards.append(card)
+
+    # Matrix Thunderbolt cards so the Tesla 1+3+3 shape is searched
+    for name in ("Trap Matrix", "Enhanced Matrix"):
+        cards.append({"tower_id": "tesla_coil", "tier": 1, "type": "Normal", "name": name,
+                      "description": "Creates a trap matrix.", "score": 8})
+    return towers, enemies, cards
+
+
+def synthetic_card_setup(card_index, tower_ids):
+    """First four Tier 1 / Tier 2 cards on every tower, Matrix Thunderbolt on the Tesla Coil"""
+    setup = {}
+    for tid in tower_ids:
+        tiers = card_index.by_tower.get(tid, {})
+        setup[tid] = {"tier_1": [c["name"] for c in tiers.get(1, [])][:4],
+                      "tier_2": [c["name"] for c in tiers.get(2, [])][:4]}
+    if "tesla_coil" in setup:
+        setup["tesla_coil"]["tier_1"][:2] = ["Trap Matrix", "Enhanced Matrix"]
+    return setup
+
+
+def measure(fn, repeat):
+    """(timings in seconds, peak traced KiB). One untimed warm-up, then `repeat` timed runs,
+    then one run under tracemalloc (worker processes are not traced)."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return timings, peak / 1024
+
+
+def cases(size):
+    n_towers, n_enemies, cards_per_tower, pool_size = SIZES[size]
+    towers, enemies, cards = synthetic_data(n_towers, n_enemies, cards_per_tower)
+    towers_db, enemies_db, synergy_db, cards_db, card_index = build_game_data(towers, enemies, cards)
+    inventory = list(towers_db)
+    card_setup = synthetic_card_setup(card_index, inventory)
+    pool = list(enemies_db)[:pool_size]
+    params = {"towers": n_towers, "enemies": n_enemies, "cards": len(cards), "pool": pool_size}
+
+    # Built on first use, i.e. in a case's untimed warm-up, and only when a selected case needs them
+    @lru_cache(maxsize=None)
+    def shared_optimizer():
+        return Optimizer(towers_db, enemies_db, synergy_db, card_index, card_setup)
+
+    @lru_cache(maxsize=None)
+    def combo():
+        return ComboOptimizer(towers_db, enemies_db, synergy_db, cards_db, card_index)
+
+    def optimizer():
+        # Shared engine and ids, but a fresh result cache every run, so each call really solves
+        base = shared_optimizer()
+        return Optimizer(towers_db, enemies_db, synergy_db, card_index, card_setup, engine=base.engine,
+                         ids=base.ids, cache=ResultCache())
+
+    rules = load_scoring_rules()
+    yield "score_engine", params, lambda: ScoreEngine(towers_db, enemies_db, card_index, card_setup, rules)
+    yield "solve_optimal_loadout", params, lambda: optimizer().solve_optimal_loadout(pool[:3], inventory)
+    yield "solve_optimal_loadout_exact", params, lambda: optimizer().solve_optimal_loadout(pool[:3], inventory, exact=True)
+    yield "weekly_top_teams", params, lambda: optimizer().weekly_top_teams(pool, inventory)
+    yield "combo_optimizer_build", params, lambda: ComboOptimizer(towers_db, enemies_db, synergy_db, cards_db, card_index)
+    yield "combo_best_combinations", params, lambda: combo().get_best_combinations(top_n=10)
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, only=None):
+    results = []
+    for size in sizes:
+        for name, params, fn in cases(size):
+            if only and name not in only:
+                continue
+            timings, peak_kib = measure(fn, repeat)
+            results.append({
+                "case": name, "size": size, "params": params, "repeat": repeat,
+                "min_s": min(timings), "median_s": statistics.median(timings), "peak_kib": round(peak_kib, 1),
+            })
+            print(f"{size:>7} {name:<30} median {results[-1]['median_s'] * 1000:9.2f} ms"
+                  f"   min {results[-1]['min_s'] * 1000:9.2f} ms   peak {peak_kib:10.1f} KiB", flush=True)
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """Median ratio against an earlier results file, per (size, case) present in both"""
+    previous = {(r["size"], r["case"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    for r in current["results"]:
+        old = previous.get((r["size"], r["case"]))
+        if old:
+            ratio = r["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+            print(f"{r['size']:>7} {r['case']:<30} x{ratio:6.2f} time   x{r['peak_kib'] / max(old['peak_kib'], 1e-9):6.2f} memory")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(SIZES), help="comma-separated subset of: " + ", ".join(SIZES))
+    parser.add_argument("--cases", help="comma-separated case names to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare medians against")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+
+    report = run(sizes, max(1, args.repeat), set(args.cases.split(",")) if args.cases else None)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
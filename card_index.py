@@ -0,0 +1,132 @@
+# Lower-case card name fragments that set up a wave condition (see analyze_user_setup)
+SETUP_CONDITION_KEYWORDS = {
+    "Burn": ["ignition", "burn", "flame"],
+    "Paralyze": ["paraly", "shock"],
+    "Slow": ["slow", "stasis", "matrix"],
+    "Vulnerable": ["vulnerable", "mark"],
+}
+
+# Card name keywords that switch on a status effect for the tower carrying the card
+CARD_EFFECT_KEYWORDS = {
+    "Burn": ["Ignition", "Burning", "Flame"],
+    "Paralyze": ["Paralysis", "Paralyze"],
+    "Slow": ["Slow", "Stasis"],
+    "Stealth Reveal": ["Stealth Reveal", "Ignition"],
+}
+
+# One bit per effect / damage type a card can carry (setup conditions, status effects, combo tags)
+CARD_TAGS = ["Burn", "Paralyze", "Slow", "Vulnerable", "Stealth Reveal",
+             "Fire", "Electric", "Energy", "Physical", "Force-field"]
+CARD_TAG_BITS = {tag: 1 << i for i, tag in enumerate(CARD_TAGS)}
+
+
+def get_combo_tags(description, name):
+    desc = description.lower() + " " + name.lower()
+    tags = set()
+    if any(x in desc for x in ["fire", "flame", "burn", "ignition"]): tags.add("Fire")
+    if any(x in desc for x in ["lightning", "shock", "paralyze", "thunder", "electric"]): tags.add("Electric")
+    if any(x in desc for x in ["laser", "beam", "energy", "refraction"]): tags.add("Energy")
+    if any(x in desc for x in ["physical", "shell", "bullet", "mine", "impact"]): tags.add("Physical")
+    if any(x in desc for x in ["force", "black hole", "pull", "teleport", "disruption"]): tags.add("Force-field")
+    if "vulnerable" in desc: tags.add("Vulnerable")
+    if "slow" in desc: tags.add("Slow")
+    return tags
+
+
+def check_mask_width(names):
+    """Raise if names cannot each get a bit of a uint64 mask"""
+    if len(names) > 64:
+        raise ValueError(f"Too many distinct tags for a 64-bit mask: {len(names)}")
+
+
+def tag_mask(tags):
+    mask = 0
+    for tag in tags:
+        mask |= CARD_TAG_BITS[tag]
+    return mask
+
+
+def mask_tags(mask):
+    """Tag names for the bits set in a CARD_TAGS mask"""
+    return {tag for tag, bit in CARD_TAG_BITS.items() if mask & bit}
+
+
+def _condition_mask(card_name):
+    text = str(card_name).lower()
+    return tag_mask(c for c, keys in SETUP_CONDITION_KEYWORDS.items() if any(k in text for k in keys))
+
+
+def _effect_mask(card_name):
+    return tag_mask(e for e, keys in CARD_EFFECT_KEYWORDS.items() if any(k in card_name for k in keys))
+
+
+class CardIndex:
+    """Every card lookup the app needs, built in one pass at load time.
+    Keyword matching runs once per card name here; scoring reads the resulting CARD_TAGS bitmasks.
+    Tag sets are interned, so equal sets are one shared frozenset."""
+
+    def __init__(self, cards):
+        self.by_tower = {}        # tower_id -> {tier: [card]}
+        self.by_name = {}         # (tower_id, name) -> card
+        self.by_type = {}         # (tower_id, type) -> [card]
+        self.chain_groups = {}    # tower_id -> {chain_group: [card]}
+        self.combo_partners = {}  # tower_id -> {partner_id: [card]}
+        self.slot_options = {}    # tower_id -> sorted Tier 1 + Tier 2 names
+        self.slot_position = {}   # tower_id -> {name: position in slot_options}
+        self._interned = {}
+        self._combo_tags = {}
+        self._conditions = {}     # card name -> setup condition mask
+        self._effects = {}        # card name -> status effect mask
+
+        for c in cards:
+            tid = c['tower_id']
+            tiers = self.by_tower.setdefault(tid, {1: [], 2: [], 3: []})
+            if c['tier'] in tiers:
+                tiers[c['tier']].append(c)
+            self.by_name[(tid, c['name'])] = c
+            if c['name'] not in self._effects:
+                self._conditions[c['name']] = _condition_mask(c['name'])
+                self._effects[c['name']] = _effect_mask(c['name'])
+            self.by_type.setdefault((tid, c.get('type')), []).append(c)
+            if 'chain_group' in c:
+                self.chain_groups.setdefault(tid, {}).setdefault(c['chain_group'], []).append(c)
+            if c.get('type') == 'Combo' and 'combo_partner' in c:
+                self.combo_partners.setdefault(tid, {}).setdefault(c['combo_partner'], []).append(c)
+                self._combo_tags[(tid, c['name'])] = self._intern(get_combo_tags(c['description'], c['name']))
+
+        for tid, tiers in self.by_tower.items():
+            options = sorted({c['name'] for c in tiers[1] + tiers[2]})
+            self.slot_options[tid] = options
+            self.slot_position[tid] = {name: i for i, name in enumerate(options)}
+
+    def _intern(self, tags):
+        tags = frozenset(tags)
+        return self._interned.setdefault(tags, tags)
+
+    def tower_cards(self, tower_id, tiers=(1, 2, 3)):
+        cards = self.by_tower.get(tower_id, {})
+        return [c for tier in tiers for c in cards.get(tier, [])]
+
+    def card(self, tower_id, name):
+        return self.by_name.get((tower_id, name))
+
+    def combo_tags(self, card):
+        """Interned get_combo_tags result for a Combo card"""
+        tags = self._combo_tags.get((card['tower_id'], card['name']))
+        if tags is None:
+            tags = self._intern(get_combo_tags(card['description'], card['name']))
+        return tags
+
+    def condition_mask(self, card_name):
+        """CARD_TAGS mask of the wave conditions a single equipped card sets up"""
+        mask = self._conditions.get(card_name)
+        if mask is None:  # name not in the card data (e.g. an old saved setup)
+            mask = self._conditions[card_name] = _condition_mask(card_name)
+        return mask
+
+    def effect_mask(self, card_name):
+        """CARD_TAGS mask of the status effects a single equipped card switches on"""
+        mask = self._effects.get(card_name)
+        if mask is None:
+            mask = self._effects[card_name] = _effect_mask(card_name)
+        return mask
@@ -0,0 +1,42 @@
+import numpy as np
+
+
+def pair_matrices(towers_db, card_index):
+    """Symmetric tower x tower combo / chain / diversity score matrices, rows in towers_db order.
+    Card-setup independent and Streamlit-free, so they can be built and checked without the app."""
+    tower_ids = list(towers_db)
+    tower_index = {tid: i for i, tid in enumerate(tower_ids)}
+    n = len(tower_ids)
+
+    # Combo cards, weighted x2, counted from both sides of the pair
+    combo = np.zeros((n, n), dtype=np.int64)
+    for tower_id in tower_ids:
+        for partner, cards in card_index.combo_partners.get(tower_id, {}).items():
+            if partner in tower_index:
+                combo[tower_index[tower_id], tower_index[partner]] += sum(c.get('score', 0) * 2 for c in cards)
+    combo = combo + combo.T
+
+    # Chain groups both towers can join, worth the highest step either reaches x3
+    chain_steps = {tid: {g: max(c.get('chain_step', 0) for c in cards)
+                         for g, cards in card_index.chain_groups.get(tid, {}).items()}
+                   for tid in tower_ids}
+    groups = sorted({g for steps in chain_steps.values() for g in steps})
+    member = np.zeros((n, len(groups)), dtype=bool)
+    steps = np.zeros((n, len(groups)), dtype=np.int64)
+    for tower_id, tower_steps in chain_steps.items():
+        for group, step in tower_steps.items():
+            member[tower_index[tower_id], groups.index(group)] = True
+            steps[tower_index[tower_id], groups.index(group)] = step
+    shared = member[:, None, :] & member[None, :, :]
+    chain = (np.maximum(steps[:, None, :], steps[None, :, :]) * shared).sum(axis=2) * 3
+
+    # Distinct damage tags across the pair x2: |A| + |B| - |A & B|
+    tags = sorted({t for tower in towers_db.values() for t in tower.get('damage_tags', [])})
+    has_tag = np.array([[t in tower.get('damage_tags', []) for t in tags] for tower in towers_db.values()],
+                       dtype=np.int64).reshape(n, len(tags))
+    tag_counts = has_tag.sum(axis=1)
+    diversity = (tag_counts[:, None] + tag_counts[None, :] - has_tag @ has_tag.T) * 2
+
+    for matrix in (combo, chain, diversity):
+        np.fill_diagonal(matrix, 0)
+    return {'combo': combo, 'chain': chain, 'diversity': diversity}
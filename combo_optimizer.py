@@ -1,164 +1,242 @@
 import json
+import random
 from itertools import combinations
+from math import comb
 from typing import Dict, List, Tuple, Set
+import numpy as np
 import streamlit as st
 
+from card_index import CardIndex
+from combo_matrices import pair_matrices as build_pair_matrices
+from profiling import count, timed
+from ranking import SearchBudget, TopK
+
+# Candidate teams scored per streaming step of iter_best_combinations
+COMBO_CHUNK = 4096
+# Swap evaluations for anytime_best_combinations when no budget is given
+ANYTIME_MAX_EVALS = 200_000
+# Up to this many 4-tower picks the full scan takes milliseconds, so anytime mode runs it instead
+EXACT_SCAN_COMBOS = 25_000
+
+
 class ComboOptimizer:
-    def __init__(self, towers_db, enemies_db, synergy_db, cards_db):
+    @timed("combo.build")
+    def __init__(self, towers_db, enemies_db, synergy_db, cards_db, card_index=None):
         self.towers_db = towers_db
         self.enemies_db = enemies_db
         self.synergy_db = synergy_db
         self.cards_db = cards_db
-
-        # Pre-compute tower combos and their scores
-        self._build_combo_cache()
-
-    def _build_combo_cache(self):
-        """Cache all possible tower combinations and their synergy scores"""
-        self.combo_cache = {}
-
-        for tower_ids in combinations(self.towers_db.keys(), 2):
-            # Check for combo cards between these towers
-            combo_score = 0
-            combo_cards = []
-
-            # Get cards for first tower
-            for card1 in self._get_all_tower_cards(tower_ids[0]):
-                if card1.get('type') == 'Combo' and card1.get('combo_partner') == tower_ids[1]:
-                    combo_score += card1.get('score', 0) * 2  # Weight combos higher
-                    combo_cards.append(card1)
-
-            # Get cards for second tower
-            for card2 in self._get_all_tower_cards(tower_ids[1]):
-                if card2.get('type') == 'Combo' and card2.get('combo_partner') == tower_ids[0]:
-                    combo_score += card2.get('score', 0) * 2
-                    combo_cards.append(card2)
-
-            # Check for chain compatibility
-            chain_score = self._calculate_chain_compatibility(tower_ids)
-
-            # Calculate damage type diversity
-            diversity_score = self._calculate_damage_diversity(tower_ids)
-
-            total_score = combo_score + chain_score + diversity_score
-
-            self.combo_cache[tower_ids] = {
-                'total_score': total_score,
-                'combo_score': combo_score,
-                'chain_score': chain_score,
-                'diversity_score': diversity_score,
-                'combo_cards': combo_cards,
-                'chain_groups': self._get_common_chain_groups(tower_ids)
-            }
-
-    def _get_all_tower_cards(self, tower_id):
-        """Get all cards for a tower across all tiers"""
-        cards = []
-        if tower_id in self.cards_db:
-            for tier in [1, 2, 3]:
-                cards.extend(self.cards_db[tower_id].get(tier, []))
-        return cards
-
-    def _calculate_chain_compatibility(self, tower_ids):
-        """Calculate how well towers' chain cards work together"""
-        chain_groups = self._get_common_chain_groups(tower_ids)
-
-        # Score based on number of shared chain groups and max chain steps
-        chain_score = 0
-        for group_name in chain_groups:
-            max_steps = 0
-            for tower_id in tower_ids:
-                for card in self._get_all_tower_cards(tower_id):
-                    if (card.get('type') == 'Chain' and
-                        card.get('chain_group') == group_name):
-                        max_steps = max(max_steps, card.get('chain_step', 0))
-            chain_score += max_steps * 3  # Chain completion is valuable
-
-        return chain_score
+        if card_index is None:
+            card_index = CardIndex([c for tiers in cards_db.values() for cards in tiers.values() for c in cards])
+        self.card_index = card_index
+
+        # Pre-compute tower combos and their pair score matrices
+        self._index_tower_cards()
+        matrices = build_pair_matrices(self.towers_db, self.card_index)
+        self.combo_matrix = matrices['combo']
+        self.chain_matrix = matrices['chain']
+        self.diversity_matrix = matrices['diversity']
+        self.pair_matrix = self.combo_matrix + self.chain_matrix + self.diversity_matrix
+
+    def _index_tower_cards(self):
+        """Combo cards by partner and best step per chain group, read off the card index"""
+        self.tower_ids = list(self.towers_db.keys())
+        self.tower_index = {tid: i for i, tid in enumerate(self.tower_ids)}
+        self.combo_cards_by_partner = {}
+        self.chain_steps = {}
+
+        for tower_id in self.tower_ids:
+            partners = self.card_index.combo_partners.get(tower_id, {})
+            self.combo_cards_by_partner[tower_id] = {p: cards for p, cards in partners.items() if p in self.tower_index}
+            groups = self.card_index.chain_groups.get(tower_id, {})
+            self.chain_steps[tower_id] = {g: max(c.get('chain_step', 0) for c in cards) for g, cards in groups.items()}
 
     def _get_common_chain_groups(self, tower_ids):
-        """Get chain groups that both towers can participate in"""
-        chain_groups = set()
-
-        for tower_id in tower_ids:
-            tower_chains = set()
-            for card in self._get_all_tower_cards(tower_id):
-                if card.get('type') == 'Chain':
-                    tower_chains.add(card.get('chain_group'))
-
-            if not chain_groups:
-                chain_groups = tower_chains
-            else:
-                chain_groups &= tower_chains
-
-        return chain_groups
-
-    def _calculate_damage_diversity(self, tower_ids):
-        """Calculate diversity score based on damage types"""
-        damage_types = set()
-        for tower_id in tower_ids:
-            if tower_id in self.towers_db:
-                damage_types.update(self.towers_db[tower_id].get('damage_tags', []))
-
-        # Reward having multiple damage types
-        return len(damage_types) * 2
+        """Get chain groups that every tower in tower_ids can participate in"""
+        return set.intersection(*(set(self.chain_steps[tid]) for tid in tower_ids))
 
+    def _tower_bonuses(self, enemy_type, damage_preference):
+        """Per-tower enemy and damage preference bonus, indexed like the score matrices"""
+        bonuses = np.zeros(len(self.tower_ids), dtype=np.int64)
+        for i, tower_id in enumerate(self.tower_ids):
+            if enemy_type:
+                bonuses[i] += self._calculate_enemy_effectiveness([tower_id], enemy_type)
+            if damage_preference:
+                bonuses[i] += self._calculate_damage_preference([tower_id], damage_preference)
+        return bonuses
+
+    def score_sets(self, tower_sets, matrix=None):
+        """Sum of pair scores for each row of an (N, k) array of tower indices,
+        i.e. the upper triangle of each row's index submatrix"""
+        matrix = self.pair_matrix if matrix is None else matrix
+        totals = np.zeros(len(tower_sets), dtype=matrix.dtype)
+        for p, q in combinations(range(tower_sets.shape[1]), 2):
+            totals += matrix[tower_sets[:, p], tower_sets[:, q]]
+        return totals
+
+    @timed("combo.best_combinations")
     def get_best_combinations(self, enemy_type=None, damage_preference=None, top_n=10):
         """Get the best tower combinations for normal mode (Guardian + 4 towers)"""
-        results = []
+        combos = []
+        for _, _, combos in self.iter_best_combinations(enemy_type, damage_preference, top_n, chunk=1 << 30):
+            pass
+        return combos
+
+    def iter_best_combinations(self, enemy_type=None, damage_preference=None, top_n=10, chunk=COMBO_CHUNK):
+        """get_best_combinations as a generator: candidates are scored chunk by chunk and
+        (done, total, best combinations so far) is yielded after each; the last one is final"""
+        if 'guardian' not in self.tower_index or len(self.tower_ids) < 5:
+            yield 0, 0, []
+            return
+        g = self.tower_index['guardian']
 
         # Generate all combinations of 4 towers (excluding Guardian as it's fixed)
-        other_towers = [tid for tid in self.towers_db.keys() if tid != 'guardian']
-
-        for tower_combo in combinations(other_towers, 4):
-            total_score = 0
-            combo_info = {
-                'towers': ['guardian'] + list(tower_combo),
-                'score_breakdown': {},
-                'combos': [],
-                'chains': []
-            }
-
-            # Calculate scores for all tower pairs in the combo
-            for pair in combinations(combo_info['towers'], 2):
-                if pair in self.combo_cache:
-                    cache_data = self.combo_cache[pair]
-                    total_score += cache_data['total_score']
-
-                    # Store combo info for display
-                    if cache_data['combo_cards']:
-                        combo_info['combos'].extend([
-                            f"{c['name']} ({self.towers_db[c['tower_id']]['name']} + {self.towers_db[c['combo_partner']]['name']})"
-                            for c in cache_data['combo_cards']
-                        ])
-
-                    if cache_data['chain_groups']:
-                        combo_info['chains'].extend(list(cache_data['chain_groups']))
-
-                    # Update score breakdown
-                    for score_type in ['combo_score', 'chain_score', 'diversity_score']:
-                        if score_type not in combo_info['score_breakdown']:
-                            combo_info['score_breakdown'][score_type] = 0
-                        combo_info['score_breakdown'][score_type] += cache_data[score_type]
-
-            # Apply enemy type bonuses
-            if enemy_type:
-                enemy_bonus = self._calculate_enemy_effectiveness(combo_info['towers'], enemy_type)
-                total_score += enemy_bonus
-                combo_info['score_breakdown']['enemy_bonus'] = enemy_bonus
-
-            # Apply damage type preferences
-            if damage_preference:
-                pref_bonus = self._calculate_damage_preference(combo_info['towers'], damage_preference)
-                total_score += pref_bonus
-                combo_info['score_breakdown']['preference_bonus'] = pref_bonus
-
-            combo_info['total_score'] = total_score
-            results.append(combo_info)
-
-        # Sort by total score and return top N
-        results.sort(key=lambda x: x['total_score'], reverse=True)
-        return results[:top_n]
+        other_towers = [i for i in range(len(self.tower_ids)) if i != g]
+        picks = np.array(list(combinations(other_towers, 4)), dtype=np.int64).reshape(-1, 4)
+        candidates = np.hstack([np.full((len(picks), 1), g), picks])
+        count("combo.candidates", len(candidates))
+        bonuses = self._tower_bonuses(enemy_type, damage_preference)
+
+        ranking = TopK(top_n)
+        described = {}  # row -> display payload, so survivors are only described once
+        for lo in range(0, len(candidates), chunk):
+            block = candidates[lo:lo + chunk]
+            # Score the whole chunk at once; names and breakdowns come later
+            totals = self.score_sets(block) + bonuses[block].sum(axis=1)
+
+            # Only rows that can reach the top_n are offered to the heap, in row order
+            if len(totals) > top_n:
+                rows = np.flatnonzero(totals >= np.partition(totals, -top_n)[-top_n])
+            else:
+                rows = np.arange(len(totals))
+            for row in rows.tolist():
+                ranking.push(int(totals[row]), lo + row)
+
+            # Only the survivors get names, combo text, chains and the score breakdown
+            results = []
+            for total_score, row in ranking.results():
+                if row not in described:
+                    described[row] = self._describe_combination([self.tower_ids[i] for i in candidates[row]],
+                                                                total_score, enemy_type, damage_preference)
+                results.append(described[row])
+            yield min(lo + chunk, len(candidates)), len(candidates), results
+
+    @timed("combo.anytime")
+    def anytime_best_combinations(self, enemy_type=None, damage_preference=None, top_n=10,
+                                  budget_s=None, max_evals=None, seed=0):
+        """Budgeted get_best_combinations for large tower lists: greedy seed, then steepest-ascent
+        swaps of one team member for one outside tower, with random kicks out of local optima,
+        until budget_s seconds or max_evals swap evaluations are spent or the best team meets
+        the upper bound. With at most EXACT_SCAN_COMBOS picks the full scan runs instead and its
+        best score is the bound (bound_exact); otherwise the bound is each member's value plus
+        half its three best partners, which is loose.
+        Returns (combinations like get_best_combinations,
+                 {'bound', 'bound_exact', 'gap', 'evaluations', 'elapsed_s', 'optimal'})"""
+        budget = SearchBudget(budget_s, max_evals, ANYTIME_MAX_EVALS)
+        if 'guardian' not in self.tower_index or len(self.tower_ids) < 5:
+            return [], {'bound': 0, 'bound_exact': False, 'gap': None, 'evaluations': 0, 'elapsed_s': 0.0,
+                        'optimal': False}
+        picks = comb(len(self.tower_ids) - 1, 4)
+        if picks <= EXACT_SCAN_COMBOS:
+            combos = self.get_best_combinations(enemy_type, damage_preference, top_n)
+            return combos, {'bound': combos[0]['total_score'], 'bound_exact': True, 'gap': 0.0, 'evaluations': picks,
+                            'elapsed_s': budget.elapsed(), 'optimal': True}
+        rng = random.Random(seed)
+        g = self.tower_index['guardian']
+        matrix = self.pair_matrix
+        bonuses = self._tower_bonuses(enemy_type, damage_preference)
+        others = np.array([i for i in range(len(self.tower_ids)) if i != g])
+
+        # Team total = guardian bonus + per member (pair with guardian + bonus) + pairs among members
+        unary = matrix[g] + bonuses
+        inner = matrix[np.ix_(others, others)]
+        # Pairs among the 4 members are at most half of each member's 3 best partners
+        top3 = -np.sort(-inner, axis=1)[:, :3].sum(axis=1) / 2
+        bound = int(bonuses[g] + np.sort(unary[others] + top3)[-4:].sum())
+
+        def total(team):
+            return int(bonuses[g] + unary[team].sum() + matrix[np.ix_(team, team)].sum() // 2)
+
+        ranking = TopK(top_n)
+
+        def offer(team, score):
+            team = sorted(team)
+            ranking.push(score, tuple(team), key=tuple(team))
+
+        # Greedy seed: add the tower with the best marginal gain, four times
+        team = []
+        for _ in range(4):
+            gain = unary[others] + matrix[np.ix_(others, team)].sum(axis=1) if team else unary[others].copy()
+            gain[np.isin(others, team)] = np.iinfo(np.int64).min
+            team.append(int(others[int(np.argmax(gain))]))
+        current = total(team)
+        offer(team, current)
+        incumbent = (current, list(team))
+
+        while not budget.spent() and ranking.results()[0][0] < bound:
+            # delta[a, b] for swapping member a for outside tower b, all pairs at once
+            members = np.array(team)
+            outside = others[~np.isin(others, members)]
+            contrib = unary + matrix[:, members].sum(axis=1)
+            delta = contrib[outside][None, :] - matrix[np.ix_(members, outside)] - contrib[members][:, None]
+            budget.evaluations += delta.size
+
+            # Neighbours good enough for the top_n are ranked too, not just the move taken
+            for a, b in zip(*np.nonzero(current + delta > ranking.threshold)):
+                offer(team[:a] + [int(outside[b])] + team[a + 1:], int(current + delta[a, b]))
+
+            a, b = np.unravel_index(int(np.argmax(delta)), delta.shape)
+            if delta[a, b] > 0:
+                team[a] = int(outside[b])
+                current += int(delta[a, b])
+                continue
+
+            # Local optimum: kick the best team so far by swapping two members out at random
+            if current > incumbent[0]:
+                incumbent = (current, list(team))
+            team = list(incumbent[1])
+            for a in rng.sample(range(4), 2):
+                team[a] = int(rng.choice([t for t in others.tolist() if t not in team]))
+            current = total(team)
+            offer(team, current)
+
+        results = ranking.results()
+        best = results[0][0]
+        gap = max(0.0, (bound - best) / bound) if bound > 0 else 0.0
+        count("combo.candidates", budget.evaluations)
+        combos = [self._describe_combination([self.tower_ids[i] for i in (g,) + members], score, enemy_type, damage_preference)
+                  for score, members in results]
+        return combos, {'bound': bound, 'bound_exact': False, 'gap': gap, 'evaluations': budget.evaluations,
+                        'elapsed_s': budget.elapsed(), 'optimal': best >= bound}
+
+    def _describe_combination(self, towers, total_score, enemy_type=None, damage_preference=None):
+        """Display payload for one ranked combination"""
+        idx = np.array([[self.tower_index[t] for t in towers]])
+        combo_info = {
+            'towers': towers,
+            'score_breakdown': {
+                'combo_score': int(self.score_sets(idx, self.combo_matrix)[0]),
+                'chain_score': int(self.score_sets(idx, self.chain_matrix)[0]),
+                'diversity_score': int(self.score_sets(idx, self.diversity_matrix)[0]),
+            },
+            'combos': [],
+            'chains': []
+        }
+
+        for t1, t2 in combinations(towers, 2):
+            # Store combo info for display
+            for c in self.combo_cards_by_partner[t1].get(t2, []) + self.combo_cards_by_partner[t2].get(t1, []):
+                combo_info['combos'].append(
+                    f"{c['name']} ({self.towers_db[c['tower_id']]['name']} + {self.towers_db[c['combo_partner']]['name']})")
+            combo_info['chains'].extend(sorted(self._get_common_chain_groups((t1, t2))))
+
+        if enemy_type:
+            combo_info['score_breakdown']['enemy_bonus'] = self._calculate_enemy_effectiveness(towers, enemy_type)
+        if damage_preference:
+            combo_info['score_breakdown']['preference_bonus'] = self._calculate_damage_preference(towers, damage_preference)
+
+        combo_info['total_score'] = total_score
+        return combo_info
 
     def _calculate_enemy_effectiveness(self, tower_ids, enemy_type):
         """Calculate bonus score based on effectiveness against enemy type"""
@@ -282,8 +360,8 @@ def display_combo_optimizer():
                     for tag in towers_db[tower_id].get('damage_tags', []):
                         damage_types[tag] = damage_types.get(tag, 0) + 1
 
-                for damage_type, count in damage_types.items():
-                    st.markdown(f"• {damage_type}: {count} tower(s)")
+                for damage_type, n in damage_types.items():
+                    st.markdown(f"• {damage_type}: {n} tower(s)")
 
 if __name__ == "__main__":
     # Test the optimizer
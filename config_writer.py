@@ -0,0 +1,97 @@
+import atexit
+import json
+import os
+import threading
+
+# Quiet period before a pending config is written; saves arriving within it coalesce
+CONFIG_WRITE_DELAY_S = 0.5
+
+
+class ConfigWriter:
+    """Write-behind persistence for one JSON file (user_config.json).
+
+    save() only snapshots the data and returns; a background thread writes the latest
+    snapshot once no save has arrived for delay seconds. Writes go to a temporary file
+    that is renamed over the target, so readers see the old or the new file, never a
+    truncated one. A snapshot equal to what is already on disk is not written."""
+
+    def __init__(self, path, delay=CONFIG_WRITE_DELAY_S):
+        self.path = path
+        self.delay = delay
+        self.writes = 0
+        self._pending = None  # (sequence number, serialized snapshot) waiting to be written
+        self._saved = 0       # sequence number of the latest snapshot
+        self._written = None  # (sequence number, text) last on disk; text read lazily off the UI thread
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def save(self, data):
+        """Queue data for writing; cheap enough to call from every widget callback"""
+        text = json.dumps(data, indent=4)
+        with self._cond:
+            latest = self._pending or self._written
+            if latest is not None and text == latest[1]:
+                return
+            self._saved += 1
+            self._pending = (self._saved, text)
+            self._cond.notify()
+
+    def pending(self):
+        """Queued but not yet written data, or None; new sessions read this before the file"""
+        with self._cond:
+            return None if self._pending is None else json.loads(self._pending[1])
+
+    def flush(self):
+        """Write any pending snapshot now (at exit, or before reading the file elsewhere)"""
+        with self._cond:
+            pending, self._pending = self._pending, None
+        if pending is not None:
+            self._write(*pending)
+
+    def delete(self):
+        """Drop any pending snapshot and remove the file. A snapshot the writer thread
+        already picked up is older than the deletion, so it is skipped, not written back."""
+        with self._cond:
+            self._pending = None
+            self._saved += 1
+            seq = self._saved
+        with self._io_lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            # Nothing on disk as of seq: the next save is written even if it matches the old text
+            self._written = (seq, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                # Debounce: wait until saves stop arriving for a full delay
+                pending = self._pending
+                self._cond.wait(self.delay)
+                if self._pending is not pending:
+                    continue
+                self._pending = None
+            self._write(*pending)
+
+    def _write(self, seq, text):
+        with self._io_lock:
+            if self._written is None:
+                try:
+                    with open(self.path, 'r') as f: self._written = (0, f.read())
+                except OSError:
+                    self._written = (0, None)
+            if seq <= self._written[0]:
+                return  # a newer snapshot was flushed first
+            if text != self._written[1]:
+                tmp = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp, 'w') as f:
+                    f.write(text)
+                os.replace(tmp, self.path)
+                self.writes += 1
+            self._written = (seq, text)
@@ -0,0 +1,91 @@
+import glob
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# Bump when a cached class (CardIndex, ScoreEngine, ...) changes shape, so old pickles are dropped
+CACHE_SCHEMA = 4
+# Rows not written for this long are pruned on open, whatever version wrote them
+MAX_AGE_S = 30 * 24 * 3600
+
+
+def code_fingerprint(directory=os.path.dirname(os.path.abspath(__file__))):
+    """Short content hash of the app's .py files, so a code change never reads pickles
+    written by the previous code, even when CACHE_SCHEMA was not bumped"""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(directory, "*.py"))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f: digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+class DiskCache:
+    """Pickled values in a sqlite file, scoped to one data version and code fingerprint.
+    Reads only see rows of the current version, so a cold start reuses the previous run's
+    work and a data or code change starts clean. Processes on other versions may share the
+    file; old rows of any version are pruned by age and total count, never by version."""
+
+    def __init__(self, path, version, max_entries=100_000, max_age_s=MAX_AGE_S):
+        self.path = path
+        self.version = f"{version}:{CACHE_SCHEMA}:{code_fingerprint()}"
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS entries "
+                               "(key TEXT, version TEXT, value BLOB, stored REAL, PRIMARY KEY (key, version))")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored)")
+            self._conn.execute("DELETE FROM entries WHERE stored < ?", (time.time() - max_age_s,))
+            self._conn.execute("DELETE FROM entries WHERE rowid NOT IN "
+                               "(SELECT rowid FROM entries ORDER BY stored DESC LIMIT ?)", (max_entries,))
+
+    def get(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ? AND version = ?",
+                                     (key, self.version)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        try:
+            return pickle.loads(row[0])
+        except Exception:
+            # Unreadable pickle (e.g. written by code with a different class layout)
+            return default
+
+    def put(self, key, value):
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                               (key, self.version, blob, time.time()))
+
+    def stats(self):
+        with self._lock:
+            rows, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM entries "
+                                            "WHERE version = ?", (self.version,)).fetchone()
+            total, = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            return {'path': self.path, 'version': self.version, 'rows': rows, 'bytes': size, 'all_rows': total,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_disk_cache(path, version):
+    """DiskCache, or None when disabled (empty path) or the file cannot be opened"""
+    if not path:
+        return None
+    try:
+        return DiskCache(path, version)
+    except (OSError, sqlite3.Error):
+        return None
@@ -0,0 +1,145 @@
+"""Command line entry point for the solver, no Streamlit needed.
+
+    python -m gd_optimizer solve --waves a,b,c [--waves d,e,f ...] [--inventory t1,t2,...]
+    python -m gd_optimizer weekly [--pool e1,e2,...] [--inventory t1,t2,...]
+
+Settings come from user_config.json when present, defaults.json otherwise;
+flags override them. Results are printed as JSON (one line per wave list with --jsonl);
+--profile writes the timing spans and counters of the run as JSON."""
+import argparse
+import json
+import sys
+
+import profiling
+from disk_cache import open_disk_cache
+from loadout_solver import lineup_metric
+from optimizer_core import (DISK_CACHE_FILE, USER_CONFIG_FILE, Optimizer, compile_score_engine, data_version,
+                            initial_settings, load_defaults, load_game_data, load_user_config)
+from solve_cache import ResultCache
+
+
+def _id_list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _lineup(allocation, wave_scores, mode_2vs1=False):
+    """'metric' is what the lineups were ranked by: 'total' in sum mode, the best two waves in 2:1 mode"""
+    return {
+        'allocation': [list(team) for team in allocation],
+        'wave_scores': [float(s) for s in wave_scores],
+        'total': float(sum(wave_scores)),
+        'metric': float(lineup_metric(wave_scores, mode_2vs1)),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="gd_optimizer", description="Galaxy Defense loadout solver")
+    parser.add_argument("--config", default=USER_CONFIG_FILE, help="saved user config (default: %(default)s)")
+    parser.add_argument("--defaults-only", action="store_true", help="ignore the user config, use defaults.json")
+    parser.add_argument("--jsonl", action="store_true", help="one JSON object per line")
+    parser.add_argument("--no-disk-cache", action="store_true", help=f"do not read or write {DISK_CACHE_FILE}")
+    parser.add_argument("--profile", metavar="PATH", help="write timing spans and counters as JSON ('-' for stderr)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    # Options both commands take, given after the command name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--inventory", type=_id_list, help="comma-separated tower ids")
+    common.add_argument("--exact", action="store_true", default=None, help="search the full inventory")
+
+    solve = sub.add_parser("solve", parents=[common], help="best lineups for 3 waves")
+    solve.add_argument("--waves", type=_id_list, action="append",
+                       help="comma-separated enemy ids, repeat for a batch (default: saved active waves)")
+    solve.add_argument("--mode-2vs1", action="store_true", default=None, help="2:1 power mode")
+    solve.add_argument("--top-k", type=int, default=1, help="lineups per wave list")
+    solve.add_argument("--budget-ms", type=float, help="anytime search of the full inventory within this "
+                       "wall-clock budget per wave list; reports the upper bound and optimality gap")
+
+    weekly = sub.add_parser("weekly", parents=[common], help="most chosen teams across every triple of the weekly pool")
+    weekly.add_argument("--pool", type=_id_list, help="comma-separated enemy ids (default: weekly pool)")
+    return parser
+
+
+def _emit(results, jsonl, out):
+    if jsonl:
+        for result in results:
+            out.write(json.dumps(result) + "\n")
+    else:
+        json.dump(results if len(results) != 1 else results[0], out, indent=2)
+        out.write("\n")
+
+
+def main(argv=None, out=sys.stdout):
+    args = build_parser().parse_args(argv)
+    try:
+        return _run(args, out)
+    finally:
+        if args.profile == "-":
+            profiling.dump(sys.stderr)
+        elif args.profile:
+            with open(args.profile, "w") as f:
+                profiling.dump(f)
+
+
+def _run(args, out):
+    version = data_version()
+    disk = None if args.no_disk_cache else open_disk_cache(DISK_CACHE_FILE, version)
+    towers_db, enemies_db, synergy_db, cards_db, card_index = load_game_data(disk)
+    defaults = load_defaults()
+    user_conf = None if args.defaults_only else load_user_config(args.config)
+    settings = initial_settings(defaults, user_conf, towers_db, enemies_db)
+
+    inventory = args.inventory or settings['user_towers']
+    exact = settings['exact_solver'] if args.exact is None else args.exact
+    unknown = [t for t in inventory if t not in towers_db]
+    if unknown:
+        print(f"Unknown tower ids: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    engine = compile_score_engine(towers_db, enemies_db, card_index, settings['card_setup'], disk)
+    optimizer = Optimizer(towers_db, enemies_db, synergy_db, card_index, settings['card_setup'], engine=engine,
+                          cache=ResultCache(backing=disk), data_version=version)
+
+    if args.command == "weekly":
+        # Same pool the app uses: defaults.json unless overridden
+        pool = args.pool or defaults.get('weekly_enemy_pool', [])
+        _emit([{'pool': pool, 'top_teams': optimizer.weekly_top_teams(pool, inventory, exact)}], args.jsonl, out)
+        return 0
+
+    wave_lists = args.waves or [settings['active_waves']]
+    unknown = sorted({e for waves in wave_lists for e in waves if e not in enemies_db})
+    if unknown:
+        print(f"Unknown enemy ids: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    mode_2vs1 = settings['mode_2vs1'] if args.mode_2vs1 is None else args.mode_2vs1
+    if len(inventory) < 9:
+        errors = ["Error: You need at least 9 towers in inventory to fill 3 waves!"] * len(wave_lists)
+    else:
+        errors = [None if len(waves) == 3 else "Error: Each wave list needs exactly 3 enemies." for waves in wave_lists]
+
+    if args.budget_ms:
+        results = []
+        for waves, error in zip(wave_lists, errors):
+            result = {'waves': waves, 'lineups': [], 'error': error}
+            if error is None:
+                ranked, _, info = optimizer.anytime_loadouts(waves, inventory, mode_2vs1, args.top_k, args.budget_ms / 1000)
+                result.update(lineups=[_lineup(a, ws, mode_2vs1) for a, ws in ranked], bound=info['bound'],
+                              bound_exact=info['bound_exact'], gap=info['gap'], evaluations=info['evaluations'])
+            results.append(result)
+        _emit(results, args.jsonl, out)
+        return 0
+
+    # Every valid wave list goes through one batch: cache first, then the worker pool
+    valid = [waves for waves, error in zip(wave_lists, errors) if error is None]
+    ranked = iter(optimizer.rank_many(valid, inventory, mode_2vs1, exact, args.top_k))
+
+    results = []
+    for waves, error in zip(wave_lists, errors):
+        lineups = [] if error else [_lineup(a, ws, mode_2vs1) for a, ws in next(ranked)]
+        results.append({'waves': waves, 'lineups': lineups, 'error': error})
+    _emit(results, args.jsonl, out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
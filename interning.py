@@ -0,0 +1,120 @@
+import numpy as np
+
+from card_index import CARD_TAG_BITS, check_mask_width
+from scoring_rules import load_scoring_rules
+
+
+class Interner:
+    """Dense small-integer ids for a set of names, in first-seen order"""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def __getitem__(self, name):
+        return self.ids[name]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def mask(self, names):
+        """Bitmask with bit id(name) set for every known name (ids must stay below 64)"""
+        mask = 0
+        for name in names:
+            i = self.ids.get(name)
+            if i is not None:
+                mask |= 1 << i
+        return mask
+
+
+class GameIds:
+    """Integer ids for towers, enemies, cards and tags, built once at load time, plus the
+    combo cards as int-indexed arrays so pair synergies are computed without strings.
+    Tower and enemy ids follow towers_db / enemies_db order, same as ScoreEngine."""
+
+    def __init__(self, towers_db, enemies_db, card_index, rules=None):
+        self.rules = rules or load_scoring_rules()
+        self.towers = Interner(towers_db)
+        self.enemies = Interner(enemies_db)
+        self.cards = Interner(card_index.by_name)  # (tower_id, name)
+
+        # Combo cards whose two towers both exist, in card-file order
+        combos = [c for tower_partners in card_index.combo_partners.values()
+                  for cards in tower_partners.values() for c in cards
+                  if c['tower_id'] in self.towers and c['combo_partner'] in self.towers]
+        combos.sort(key=lambda c: self.cards[(c['tower_id'], c['name'])])
+        combo_tags = [card_index.combo_tags(c) for c in combos]
+
+        # One tag vocabulary for combo tags and enemy weaknesses/resistances
+        self.tags = Interner(sorted({t for tags in combo_tags for t in tags}))
+        for e in enemies_db.values():
+            for t in e.get('weakness_types', []) + e.get('resistance_types', []):
+                self.tags.add(t)
+        check_mask_width(self.tags.names)
+
+        self.enemy_weak = np.array([self.tags.mask(e.get('weakness_types', [])) for e in enemies_db.values()], dtype=np.uint64)
+        self.enemy_resist = np.array([self.tags.mask(e.get('resistance_types', [])) for e in enemies_db.values()], dtype=np.uint64)
+
+        self.combo_card = np.array([self.cards[(c['tower_id'], c['name'])] for c in combos], dtype=np.int32)
+        self.combo_tower = np.array([self.towers[c['tower_id']] for c in combos], dtype=np.int32)
+        self.combo_partner = np.array([self.towers[c['combo_partner']] for c in combos], dtype=np.int32)
+        self.combo_points = np.array([c.get('score', self.rules.default_score) * self.rules.points_per_score
+                                      for c in combos], dtype=np.float64)
+        self.combo_tags = np.array([self.tags.mask(tags) for tags in combo_tags], dtype=np.uint64)
+        # Per combo rule, the cards its description fragment matches (None: no description condition)
+        descriptions = [c['description'].lower() for c in combos]
+        self.combo_rule_cards = [np.array([rule['description'] in d for d in descriptions], dtype=bool)
+                                 if 'description' in rule else None for rule in self.rules.combo_rules]
+        self.combo_vulnerable = (self.combo_tags & np.uint64(self.tags.mask(["Vulnerable"]))) != 0
+        self._enemy_points = {}  # (enemy index, setup mask) -> points of every combo card
+
+    def combo_points_against(self, e, setup_conditions):
+        """Points of every combo card against enemy index e after the combo rules, in file order"""
+        key = (e, setup_conditions)
+        points = self._enemy_points.get(key)
+        if points is None:
+            points = self.combo_points
+            for rule, rule_cards in zip(self.rules.combo_rules, self.combo_rule_cards):
+                if 'setup' in rule and not setup_conditions & CARD_TAG_BITS[rule['setup']]:
+                    continue
+                hit = np.ones(len(points), dtype=bool)
+                if 'affinity' in rule:
+                    enemy_mask = self.enemy_weak[e] if rule['affinity'] == "weakness" else self.enemy_resist[e]
+                    hit &= (self.combo_tags & enemy_mask) != 0
+                if rule_cards is not None:
+                    hit &= rule_cards
+                points = np.where(hit, points * rule['multiply'], points) if 'multiply' in rule \
+                    else np.where(hit, points + rule['add'], points)
+            self._enemy_points[key] = points
+        return points
+
+    def pair_synergies(self, enemy_id, inventory_towers, setup_conditions):
+        """Combo points and Vulnerable hits for every synergy pair of inventory_towers against one enemy,
+        as ([i], [j], [points], [vulnerable]) with i < j positions in inventory_towers.
+        setup_conditions is a CARD_TAGS mask (optimizer_core.setup_condition_mask)."""
+        local = np.full(len(self.towers), -1, dtype=np.int64)
+        local[[self.towers[t] for t in inventory_towers]] = np.arange(len(inventory_towers))
+        i, j = local[self.combo_tower], local[self.combo_partner]
+        keep = (i >= 0) & (j >= 0) & (i != j)
+        i, j = np.minimum(i, j)[keep], np.maximum(i, j)[keep]
+
+        points = self.combo_points_against(self.enemies[enemy_id], setup_conditions)[keep]
+
+        # Sum per pair in card order (bincount accumulates in input order)
+        pair_codes, slot = np.unique(i * len(inventory_towers) + j, return_inverse=True)
+        totals = np.bincount(slot, weights=points, minlength=len(pair_codes))
+        hits = np.bincount(slot, weights=self.combo_vulnerable[keep], minlength=len(pair_codes)).astype(np.int64)
+        n = len(inventory_towers)
+        return (pair_codes // n).tolist(), (pair_codes % n).tolist(), totals.tolist(), hits.tolist()
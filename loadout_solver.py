@@ -0,0 +1,541 @@
+import random
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+
+from profiling import count, span
+from ranking import SearchBudget, TopK
+
+
+# --- TEAM SCORE TABLE ---
+def team_rank(a, b, c):
+    """Colex rank of the sorted subset a < b < c (ints or NumPy arrays)"""
+    return c * (c - 1) * (c - 2) // 6 + b * (b - 1) // 2 + a
+
+
+@lru_cache(maxsize=None)
+def _team_members(n):
+    """(C(n,3), 3) array of tower indices, row r holding the subset with colex rank r"""
+    members = np.array(list(combinations(range(n), 3)), dtype=np.int64).reshape(-1, 3)
+    return members[np.argsort(team_rank(members[:, 0], members[:, 1], members[:, 2]))]
+
+
+@lru_cache(maxsize=None)
+def _team_masks(n):
+    return [1 << a | 1 << b | 1 << c for a, b, c in _team_members(n).tolist()]
+
+
+class TeamTable:
+    """Every 3-tower team scored against every wave in one vectorized pass.
+    scores[w, r] = (sum of tower scores) x vulnerable_multiplier per Vulnerable combo + combo points,
+    for the team with colex rank r, so the searches below only do lookups and additions.
+
+    Inputs are int-indexed by position in inventory_towers: tower_scores[w][i], and per wave
+    a pair table ([i], [j], [points], [vulnerable]); names are only used to report teams."""
+
+    def __init__(self, inventory_towers, tower_scores, pair_tables, vulnerable_multiplier=1.15):
+        self.towers = list(inventory_towers)
+        self.index = {t: i for i, t in enumerate(self.towers)}
+        n, waves = len(self.towers), len(tower_scores)
+
+        self.tower_scores = np.array(tower_scores, dtype=np.float64).reshape(waves, n)
+        points = np.zeros((waves, n, n))
+        vulnerable = np.zeros((waves, n, n), dtype=np.int64)
+        for w, (i, j, p, v) in enumerate(pair_tables):
+            points[w, i, j] = points[w, j, i] = p
+            vulnerable[w, i, j] = vulnerable[w, j, i] = v
+
+        self.members = _team_members(n)
+        a, b, c = self.members[:, 0], self.members[:, 1], self.members[:, 2]
+        base = self.tower_scores[:, a] + self.tower_scores[:, b] + self.tower_scores[:, c]
+        hits = vulnerable[:, a, b] + vulnerable[:, a, c] + vulnerable[:, b, c]
+        # One multiplier per Vulnerable combo on the tower sum, applied step by step
+        for k in range(int(hits.max(initial=0))):
+            base = np.where(hits > k, base * vulnerable_multiplier, base)
+        self.scores = base + (points[:, a, b] + points[:, a, c] + points[:, b, c])
+
+    def subset(self, waves):
+        """View of this table over the given rows only, e.g. three enemies of a pool table
+        built once for many wave triples. Rows are scored independently, so a subset
+        matches a table built from those rows alone."""
+        view = object.__new__(TeamTable)
+        view.__dict__.update(self.__dict__)
+        view.tower_scores = self.tower_scores[list(waves)]
+        view.scores = self.scores[list(waves)]
+        return view
+
+    def ranks(self, teams):
+        """Colex ranks for an (N, 3) array of tower indices, in any order within a row"""
+        teams = np.sort(teams, axis=1)
+        return team_rank(teams[:, 0], teams[:, 1], teams[:, 2])
+
+    def team(self, rank):
+        return tuple(self.towers[i] for i in self.members[rank])
+
+    def team_score(self, wave, team):
+        if len(team) == 1:
+            return float(self.tower_scores[wave, self.index[team[0]]])
+        a, b, c = sorted(self.index[t] for t in team)
+        return float(self.scores[wave, team_rank(a, b, c)])
+
+
+# --- TOP-9 PARTITION SEARCH ---
+_OTHER_WAVES = np.array([[1, 2], [0, 2], [0, 1]])
+
+
+@lru_cache(maxsize=None)
+def _split_patterns(n):
+    """Every ordered split of range(n) (n = 9) into 3 teams, in the old nested-loop order"""
+    w1s, w2s, w3s = [], [], []
+    for w1_set in combinations(range(n), 3):
+        remaining_6 = [x for x in range(n) if x not in w1_set]
+        for w2_set in combinations(remaining_6, 3):
+            w1s.append(w1_set)
+            w2s.append(w2_set)
+            w3s.append([x for x in remaining_6 if x not in w2_set])
+    return np.array(w1s), np.array(w2s), np.array(w3s)
+
+
+@lru_cache(maxsize=None)
+def _tesla_patterns(n):
+    """Every (tesla wave, team1, team2) pick of 2 teams of 3 from range(n), in the old loop order"""
+    waves, team1s, team2s = [], [], []
+    for tesla_wave_idx in range(3):
+        for towers_for_teams in combinations(range(n), 6):
+            for team1 in combinations(towers_for_teams, 3):
+                waves.append(tesla_wave_idx)
+                team1s.append(team1)
+                team2s.append([x for x in towers_for_teams if x not in team1])
+    return np.array(waves), np.array(team1s), np.array(team2s)
+
+
+def lineup_metric(wave_scores, mode_2vs1=False):
+    """Optimisation metric of one lineup: the wave score sum, or the best two waves in 2:1 mode"""
+    return sum(sorted(wave_scores, reverse=True)[:2]) if mode_2vs1 else sum(wave_scores)
+
+
+def _metric(wave_scores, mode_2vs1):
+    """lineup_metric per candidate row of an (N, 3) wave score array"""
+    if mode_2vs1:
+        ordered = np.sort(wave_scores, axis=1)
+        return ordered[:, 2] + ordered[:, 1]
+    return wave_scores[:, 0] + wave_scores[:, 1] + wave_scores[:, 2]
+
+
+def _top_rows(metric, top_k):
+    """Row indices of the top_k metric values, best first, earliest row winning ties"""
+    if len(metric) > top_k:
+        cutoff = np.partition(metric, -top_k)[-top_k]
+        rows = np.flatnonzero(metric >= cutoff)
+    else:
+        rows = np.arange(len(metric))
+    ranking = TopK(top_k)
+    for row in rows.tolist():
+        ranking.push(metric[row], row)
+    return [row for _, row in ranking.results()]
+
+
+# Candidate rows scored per streaming step of the top-9 search
+PARTITION_CHUNK = 512
+
+
+def _partition_steps(table, has_tesla_matrix, mode_2vs1, top_k, chunk):
+    """Top-9 search over a built TeamTable, scoring candidate rows chunk by chunk.
+    Yields (rows done, rows total, top_k [(allocation, wave_scores)] so far)"""
+    tower_utility = table.tower_scores.sum(axis=0)
+    top_9 = np.argsort(-tower_utility, kind='stable')[:9]
+
+    def names(indices):
+        return tuple(table.towers[i] for i in indices)
+
+    # When Tesla Matrix is available, it's ALWAYS preferred over normal 3x3
+    if has_tesla_matrix:
+        # Use Tesla Matrix configuration: 1 Tesla + 2 teams of 3
+        tesla = table.index["tesla_coil"]
+        remaining_towers = np.array([t for t in top_9 if t != tesla])
+        if len(remaining_towers) < 8:  # Need 8 other towers to pick best 6
+            yield 0, 0, []
+            return
+
+        tesla_waves, team1s, team2s = _tesla_patterns(len(remaining_towers))
+        team1s, team2s = remaining_towers[team1s], remaining_towers[team2s]
+        others = _OTHER_WAVES[tesla_waves]
+        total = len(tesla_waves)
+
+        def wave_scores(lo, hi):
+            waves, other = tesla_waves[lo:hi], others[lo:hi]
+            rows = np.arange(hi - lo)
+            scores = np.empty((hi - lo, 3))
+            scores[rows, waves] = table.tower_scores[waves, tesla]
+            scores[rows, other[:, 0]] = table.scores[other[:, 0], table.ranks(team1s[lo:hi])]
+            scores[rows, other[:, 1]] = table.scores[other[:, 1], table.ranks(team2s[lo:hi])]
+            return scores
+
+        def allocation(row):
+            current_sets = [None, None, None]
+            current_sets[tesla_waves[row]] = ("tesla_coil",)
+            current_sets[others[row, 0]] = names(team1s[row])
+            current_sets[others[row, 1]] = names(team2s[row])
+            return current_sets
+    else:
+        if len(top_9) < 9:
+            yield 0, 0, []
+            return
+        # Normal configuration: 3 teams of 3 towers each
+        splits = [top_9[p] for p in _split_patterns(9)]
+        total = len(splits[0])
+
+        def wave_scores(lo, hi):
+            return np.stack([table.scores[w, table.ranks(split[lo:hi])] for w, split in enumerate(splits)], axis=1)
+
+        def allocation(row):
+            return [names(split[row]) for split in splits]
+
+    count("solve.candidates", total)
+    # Chunk winners are offered in row order, so ties resolve exactly as in one pass
+    ranking = TopK(top_k)
+    for lo in range(0, total, chunk):
+        hi = min(lo + chunk, total)
+        scores = wave_scores(lo, hi)
+        metric = _metric(scores, mode_2vs1)
+        for row in sorted(_top_rows(metric, top_k)):
+            ranking.push(metric[row], (lo + row, scores[row].tolist()))
+        yield hi, total, [(allocation(row), ws) for _, (row, ws) in ranking.results()]
+
+
+def iter_partition(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1=False, top_k=1,
+                   vulnerable_multiplier=1.15, chunk=PARTITION_CHUNK):
+    """solve_partition as a generator of (done, total, best-so-far results); the last one is final"""
+    with span("team_table"):
+        table = TeamTable(inventory_towers, tower_scores, pair_tables, vulnerable_multiplier)
+    yield from _partition_steps(table, has_tesla_matrix, mode_2vs1, top_k, chunk)
+
+
+def solve_partition(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1=False, top_k=1,
+                    vulnerable_multiplier=1.15):
+    """Best splits of the 9 highest-utility towers over 3 waves.
+    tower_scores and pair_tables hold one entry per wave; everything is plain data so
+    the solve can be hashed, cached or shipped to another process.
+    Returns up to top_k [(allocation, wave_scores)], best first"""
+    for _, _, results in iter_partition(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1, top_k,
+                                        vulnerable_multiplier, chunk=1 << 30):
+        pass
+    return results
+
+
+# --- EXACT SOLVER ---
+def _rank_teams(table):
+    """Per wave, every team as (score, mask, rank), best first.
+    mask has bit i set for inventory tower i"""
+    masks = _team_masks(len(table.towers))
+    ranked = []
+    for wave_scores in table.scores:
+        order = np.argsort(-wave_scores, kind='stable').tolist()
+        scores = wave_scores.tolist()
+        ranked.append([(scores[r], masks[r], r) for r in order])
+    return ranked
+
+
+def _best_disjoint(ranked, waves, used=0, top_k=1):
+    """Branch-and-bound: highest-scoring pairwise disjoint teams for the given waves,
+    avoiding towers in used. Bound = running total + best unconstrained team of every
+    later wave, checked against the current k-th best.
+    Returns up to top_k [(total, {wave: (score, mask, rank)})], best first"""
+    if not waves:
+        return [(0, {})]
+    tail = [0] * (len(waves) + 1)
+    for d in range(len(waves) - 1, -1, -1):
+        tail[d] = tail[d + 1] + (ranked[waves[d]][0][0] if ranked[waves[d]] else 0)
+
+    ranking = TopK(top_k)
+    chosen = []
+    last = len(waves) - 1
+    nodes = 0
+
+    def descend(depth, used, total):
+        nonlocal nodes
+        nodes += 1
+        for entry in ranked[waves[depth]]:
+            score, mask = entry[0], entry[1]
+            if total + score + tail[depth + 1] <= ranking.threshold:
+                break  # lists are sorted, nothing further down can win
+            if mask & used:
+                continue
+            if depth == last:
+                ranking.push(total + score, dict(zip(waves, chosen + [entry])))
+                continue
+            chosen.append(entry)
+            descend(depth + 1, used | mask, total + score)
+            chosen.pop()
+
+    descend(0, used, 0)
+    count("solve.candidates", nodes)
+    return ranking.results()
+
+
+def iter_exact(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1=False, top_k=1,
+               vulnerable_multiplier=1.15, provisional=True):
+    """solve_exact as a generator of (done, total, best-so-far results), one step per
+    (shape, objective) search. With provisional, the first step is the top-9 answer, ready in
+    milliseconds, kept until the exact ranking is at least as good. The last step is final."""
+    with span("team_table"):
+        table = TeamTable(inventory_towers, tower_scores, pair_tables, vulnerable_multiplier)
+    yield from _exact_steps(table, has_tesla_matrix, mode_2vs1, top_k, provisional)
+
+
+def _exact_steps(table, has_tesla_matrix, mode_2vs1, top_k, provisional):
+    inventory_towers = table.towers
+    # Shapes: which waves are pinned to Tesla solo, and the towers that pin removes
+    if has_tesla_matrix:
+        tesla_bit = 1 << inventory_towers.index("tesla_coil")
+        shapes = [({k: ("tesla_coil",)}, tesla_bit) for k in range(3)]
+    else:
+        shapes = [({}, 0)]
+
+    # In 2:1 mode the metric is the best pair of waves, so optimise each pair exactly
+    # and rank the leftover wave's teams that still fit, so alternatives differing only
+    # in the leftover team are ranked too
+    if mode_2vs1:
+        objectives = [(0, 1), (0, 2), (1, 2)]
+    else:
+        objectives = [(0, 1, 2)]
+
+    done, total = 0, len(shapes) * len(objectives)
+    quick, quick_best = [], -float('inf')
+    if provisional:
+        for _, _, quick in _partition_steps(table, has_tesla_matrix, mode_2vs1, top_k, 1 << 30):
+            pass
+        if quick:
+            quick_best = lineup_metric(quick[0][1], mode_2vs1)
+        done, total = 1, total + 1
+        yield done, total, quick
+
+    with span("team_rank"):
+        ranked = _rank_teams(table)
+
+    ranking = TopK(top_k)
+    for pinned, pinned_mask in shapes:
+        free = [w for w in range(3) if w not in pinned]
+        for objective in objectives:
+            optimised = [w for w in free if w in objective]
+            leftover = [w for w in free if w not in objective]
+
+            for _, picked in _best_disjoint(ranked, optimised, pinned_mask, top_k):
+                used = pinned_mask
+                for _, mask, _ in picked.values(): used |= mask
+                for _, rest in _best_disjoint(ranked, leftover, used, top_k):
+                    teams = {**picked, **rest}
+                    current_sets = [pinned[w] if w in pinned else table.team(teams[w][2]) for w in range(3)]
+                    current_wave_scores = [table.team_score(i, s) for i, s in enumerate(current_sets)]
+                    ranking.push(lineup_metric(current_wave_scores, mode_2vs1), (current_sets, current_wave_scores),
+                                 key=tuple(current_sets))
+
+            done += 1
+            results = [item for _, item in ranking.results()]
+            if done < total and (not results or ranking.results()[0][0] < quick_best):
+                results = quick
+            yield done, total, results
+
+
+def solve_exact(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1=False, top_k=1,
+                vulnerable_multiplier=1.15):
+    """Provably best splits over the full inventory (no top-9 cut).
+    Covers the 3x3 shape and the Tesla Matrix 1+3+3 shape, in sum and 2:1 mode.
+    Returns up to top_k [(allocation, wave_scores)], best first, same as solve_partition"""
+    for _, _, results in iter_exact(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1, top_k,
+                                    vulnerable_multiplier, provisional=False):
+        pass
+    return results
+
+
+# --- ANYTIME SOLVER ---
+# Evaluation budget when the caller gives neither a time nor an evaluation limit
+DEFAULT_MAX_EVALS = 20_000
+# Up to this many towers the exact search takes milliseconds (about 25 ms at 40), so it settles the bound
+EXACT_BOUND_TOWERS = 40
+
+
+def loadout_bound(table, has_tesla_matrix, mode_2vs1=False):
+    """Upper bound on the metric of any lineup: every wave gets its best team, overlaps ignored"""
+    if has_tesla_matrix:
+        tesla = table.index["tesla_coil"]
+        free = ~(table.members == tesla).any(axis=1)
+        best = table.scores[:, free].max(axis=1, initial=-np.inf)
+        shapes = [[table.tower_scores[w, tesla] if w == k else best[w] for w in range(3)] for k in range(3)]
+    else:
+        shapes = [table.scores.max(axis=1, initial=-np.inf).tolist()]
+    return float(_metric(np.array(shapes), mode_2vs1).max())
+
+
+def solve_anytime(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1=False, top_k=1,
+                  vulnerable_multiplier=1.15, budget_s=None, max_evals=None, seed=0):
+    """Budgeted lineup search over the full inventory: the top-9 answer as greedy seed, then
+    steepest-ascent local search (swap a tower with the bench, swap towers or whole teams
+    between waves) with random kicks out of local optima, until the wall-clock budget_s or
+    max_evals lineup evaluations are spent, or the best lineup meets the upper bound.
+    With at most EXACT_BOUND_TOWERS towers the exact answer is the seed and the bound
+    (bound_exact), unless the budget runs out first; otherwise the bound is loadout_bound,
+    which ignores shared towers. The search always covers the full inventory, so it has
+    no separate exact switch.
+    Returns (up to top_k [(allocation, wave_scores)] best first,
+             {'bound', 'bound_exact', 'gap', 'evaluations', 'elapsed_s', 'optimal'})"""
+    budget = SearchBudget(budget_s, max_evals, DEFAULT_MAX_EVALS)
+    rng = random.Random(seed)
+
+    with span("team_table"):
+        table = TeamTable(inventory_towers, tower_scores, pair_tables, vulnerable_multiplier)
+    n = len(table.towers)
+    tesla = table.index.get("tesla_coil") if has_tesla_matrix else None
+
+    def wave_score(w, team):
+        if len(team) == 1:
+            return float(table.tower_scores[w, team[0]])
+        a, b, c = sorted(team)
+        return float(table.scores[w, team_rank(a, b, c)])
+
+    ranking = TopK(top_k)
+
+    def offer(teams, wave_scores):
+        allocation = [tuple(table.towers[i] for i in sorted(team)) for team in teams]
+        ranking.push(lineup_metric(wave_scores, mode_2vs1), (allocation, list(wave_scores)), key=tuple(allocation))
+
+    # Seed: the exact answers for small inventories, else the top-9 answers, or a random
+    # lineup when the top 9 cannot fill the shape. The exact search stops between steps once
+    # the budget is spent, keeping the best answers so far and the loose bound.
+    bound_exact = False
+    if n <= EXACT_BOUND_TOWERS:
+        for done, total, seeded in _exact_steps(table, has_tesla_matrix, mode_2vs1, top_k, provisional=True):
+            if done == total:
+                bound_exact = bool(seeded)
+            elif budget.spent():
+                break
+    else:
+        seeded = _last_step(_partition_steps(table, has_tesla_matrix, mode_2vs1, top_k, 1 << 30))
+    bound = lineup_metric(seeded[0][1], mode_2vs1) if bound_exact else loadout_bound(table, has_tesla_matrix, mode_2vs1)
+    seeds = [[[table.index[t] for t in team] for team in allocation] for allocation, _ in seeded]
+    if not seeds:
+        if has_tesla_matrix and (tesla is None or n < 7):
+            return [], {'bound': bound, 'bound_exact': False, 'gap': None, 'evaluations': 0,
+                        'elapsed_s': budget.elapsed(), 'optimal': False}
+        others = [i for i in range(n) if i != tesla]
+        rng.shuffle(others)
+        if has_tesla_matrix:
+            seeds.append([[tesla], others[:3], others[3:6]])
+        else:
+            seeds.append([others[:3], others[3:6], others[6:9]])
+    for teams in seeds:
+        offer(teams, [wave_score(w, t) for w, t in enumerate(teams)])
+
+    teams = [list(t) for t in seeds[0]]
+    scores = [wave_score(w, t) for w, t in enumerate(teams)]
+    current = lineup_metric(scores, mode_2vs1)
+    incumbent = (current, [list(t) for t in teams])
+
+    def neighbours():
+        """(changed {wave: team}) for every move from the current lineup"""
+        used = {i for team in teams for i in team}
+        bench = [i for i in range(n) if i not in used and i != tesla]
+        free = [w for w in range(3) if len(teams[w]) == 3]
+        for w in free:
+            for p in range(3):
+                for b in bench:
+                    team = teams[w][:p] + [b] + teams[w][p + 1:]
+                    yield {w: team}
+        for x, w1 in enumerate(free):
+            for w2 in free[x + 1:]:
+                for p1 in range(3):
+                    for p2 in range(3):
+                        t1, t2 = list(teams[w1]), list(teams[w2])
+                        t1[p1], t2[p2] = t2[p2], t1[p1]
+                        yield {w1: t1, w2: t2}
+        for w1 in range(3):
+            for w2 in range(w1 + 1, 3):
+                yield {w1: teams[w2], w2: teams[w1]}
+
+    while not budget.spent() and ranking.results()[0][0] < bound - 1e-9:
+        best_move, best_metric = None, current
+        for move in neighbours():
+            budget.evaluations += 1
+            trial = list(scores)
+            for w, team in move.items():
+                trial[w] = wave_score(w, team)
+            metric = lineup_metric(trial, mode_2vs1)
+            if metric > best_metric + 1e-9:
+                best_move, best_metric, best_scores = move, metric, trial
+            if budget.spent():
+                break
+
+        if best_move is None:
+            # Local optimum: kick the best lineup so far with two random moves and climb again
+            if current > incumbent[0]:
+                incumbent = (current, [list(t) for t in teams])
+            teams = [list(t) for t in incumbent[1]]
+            for _ in range(2):
+                for w, team in rng.choice(list(neighbours())).items():
+                    teams[w] = list(team)
+            scores = [wave_score(w, t) for w, t in enumerate(teams)]
+            current = lineup_metric(scores, mode_2vs1)
+            budget.evaluations += 1
+            offer(teams, scores)
+            continue
+
+        for w, team in best_move.items():
+            teams[w] = list(team)
+        scores, current = best_scores, best_metric
+        offer(teams, scores)
+
+    results = ranking.results()
+    best = results[0][0]
+    gap = max(0.0, (bound - best) / bound) if bound > 0 else 0.0
+    count("solve.candidates", budget.evaluations)
+    return [item for _, item in results], {
+        'bound': bound, 'bound_exact': bound_exact, 'gap': gap, 'evaluations': budget.evaluations,
+        'elapsed_s': budget.elapsed(), 'optimal': gap <= 1e-12,
+    }
+
+
+def _last_step(steps):
+    """Results of the final (done, total, results) step of a streaming search"""
+    results = []
+    for _, _, results in steps:
+        pass
+    return results
+
+
+def solve_loadout(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1=False, exact=False, top_k=1,
+                  vulnerable_multiplier=1.15):
+    """Entry point used by the app and the worker pool.
+    Returns up to top_k [(allocation, wave_scores)], best first"""
+    solver = solve_exact if exact else solve_partition
+    count("solves")
+    with span("solve.exact" if exact else "solve.partition"):
+        return solver(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1, top_k, vulnerable_multiplier)
+
+
+def solve_pool(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, triples, mode_2vs1=False, exact=False,
+               top_k=1, vulnerable_multiplier=1.15):
+    """solve_loadout for many wave triples drawn from one enemy pool.
+    tower_scores and pair_tables hold one entry per pool enemy and each triple is three indices
+    into them, so the team table is built once per pool instead of once per triple.
+    Returns one solve_loadout result per triple, in order"""
+    with span("team_table"):
+        pool = TeamTable(inventory_towers, tower_scores, pair_tables, vulnerable_multiplier)
+    results = []
+    for triple in triples:
+        table = pool.subset(triple)
+        count("solves")
+        with span("solve.exact" if exact else "solve.partition"):
+            if exact:
+                results.append(_last_step(_exact_steps(table, has_tesla_matrix, mode_2vs1, top_k, provisional=False)))
+            else:
+                results.append(_last_step(_partition_steps(table, has_tesla_matrix, mode_2vs1, top_k, 1 << 30)))
+    return results
+
+
+def iter_loadout(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1=False, exact=False, top_k=1,
+                 vulnerable_multiplier=1.15):
+    """Streaming solve_loadout: yields (done, total, best-so-far results), the last one final"""
+    solver = iter_exact if exact else iter_partition
+    count("solves")
+    yield from solver(inventory_towers, tower_scores, pair_tables, has_tesla_matrix, mode_2vs1, top_k, vulnerable_multiplier)
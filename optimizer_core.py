@@ -0,0 +1,402 @@
+import hashlib
+import json
+import os
+from itertools import combinations
+
+from card_index import CardIndex, mask_tags
+from interning import GameIds
+from loadout_solver import iter_loadout, solve_anytime
+from profiling import count, span, timed
+from score_engine import ScoreEngine
+from scoring_rules import RULES_FILE, load_scoring_rules
+from solve_cache import ResultCache, content_key
+from weekly_backend import empty_tally, merge_tallies, reduce_tallies, run_pool_solves, tally_loadout
+
+# Paths
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULTS_FILE = os.path.join(DATA_DIR, "defaults.json")
+TOWERS_FILE = os.path.join(DATA_DIR, "towers.json")
+ENEMIES_FILE = os.path.join(DATA_DIR, "enemies.json")
+CARDS_FILE = os.path.join(DATA_DIR, "cards.json")
+USER_CONFIG_FILE = "user_config.json"
+# Wave triples solved per progress step of iter_weekly_top_teams
+WEEKLY_CHUNK = 512
+# Solve results, data indexes and score matrices survive restarts here; set to "" to disable
+DISK_CACHE_FILE = os.environ.get("GD_OPTIMIZER_DISK_CACHE", os.path.join(DATA_DIR, ".cache", "results.sqlite"))
+
+
+# --- DATA LOADING ---
+@timed("load_data")
+def load_data():
+    # Load Towers
+    if os.path.exists(TOWERS_FILE):
+        with open(TOWERS_FILE, 'r') as f: towers = json.load(f)
+    else:
+        towers = {}
+
+    # Load Enemies
+    if os.path.exists(ENEMIES_FILE):
+        with open(ENEMIES_FILE, 'r') as f: enemies = json.load(f)
+    else:
+        # Fallback to prevent crash if file missing
+        enemies = [{"id": "dummy", "name": "Unknown Enemy", "type": "Normal", "tags": [], "weakness_types": [], "resistance_types": []}]
+
+    # Load Cards
+    if os.path.exists(CARDS_FILE):
+        with open(CARDS_FILE, 'r') as f: cards = json.load(f)
+    else:
+        cards = []
+
+    return build_game_data(towers, enemies, cards)
+
+def build_game_data(towers, enemies, cards):
+    """Lookups the app and solver use, from the raw towers / enemies / cards JSON"""
+    enemies_dict = {e['id']: e for e in enemies}
+
+    # Process Synergies & Card Lookup
+    synergy_map = {}
+
+    for c in cards:
+        # Build Synergy Map
+        if c.get('type') == 'Combo' and 'combo_partner' in c:
+            pair_key = frozenset({c['tower_id'], c['combo_partner']})
+            if pair_key not in synergy_map:
+                synergy_map[pair_key] = []
+            synergy_map[pair_key].append(c)
+
+    # Card Lookup: tower / name / type / chain group / combo partner, tags interned
+    card_index = CardIndex(cards)
+
+    return towers, enemies_dict, synergy_map, card_index.by_tower, card_index
+
+def data_version(paths=(TOWERS_FILE, ENEMIES_FILE, CARDS_FILE, DEFAULTS_FILE, RULES_FILE)):
+    """Short content hash of the data files, part of every cached result's key"""
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, 'rb') as f: digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+def load_game_data(disk=None):
+    """load_data, served from the disk cache when the data files are unchanged"""
+    if disk is None:
+        return load_data()
+    game_data = disk.get("game_data")
+    if game_data is None:
+        game_data = load_data()
+        disk.put("game_data", game_data)
+    return game_data
+
+def compile_score_engine(towers_db, enemies_db, card_index, card_setup, disk=None, rules=None):
+    """ScoreEngine for a card setup, served from the disk cache when it was compiled before"""
+    key = content_key("score_engine", card_setup)
+    engine = disk.get(key) if disk is not None else None
+    if engine is None:
+        engine = ScoreEngine(towers_db, enemies_db, card_index, card_setup, rules)
+        if disk is not None:
+            disk.put(key, engine)
+    return engine
+
+def load_defaults():
+    if os.path.exists(DEFAULTS_FILE):
+        with open(DEFAULTS_FILE, 'r') as f: return json.load(f)
+    return {}
+
+def load_user_config(path=USER_CONFIG_FILE):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f: return json.load(f)
+        except: return None
+    return None
+
+def initial_settings(defaults, user_conf, towers_db, enemies_db):
+    """Starting settings: saved user config where present, defaults.json otherwise"""
+    user_conf = user_conf or {}
+    settings = {}
+
+    if 'user_towers' in user_conf:
+        settings['user_towers'] = user_conf['user_towers']
+    else:
+        default_ids = defaults.get("available_towers", list(towers_db.keys())[:9])
+        settings['user_towers'] = [tid for tid in default_ids if tid in towers_db]
+
+    # Enemy Pool (Ensure not empty)
+    if user_conf.get('weekly_enemy_pool'):
+        settings['weekly_enemy_pool'] = user_conf['weekly_enemy_pool']
+    else:
+        valid_pool = [eid for eid in defaults.get("weekly_enemy_pool", []) if eid in enemies_db]
+        if not valid_pool:
+            valid_pool = list(enemies_db.keys())[:8]
+        settings['weekly_enemy_pool'] = valid_pool
+
+    settings['card_setup'] = user_conf['card_setup'] if 'card_setup' in user_conf else defaults.get("weekly_card_setup", {})
+
+    # Active Waves (Ensure exactly 3 valid items)
+    if len(user_conf.get('active_waves', [])) == 3:
+        settings['active_waves'] = user_conf['active_waves']
+    else:
+        pool = settings['weekly_enemy_pool']
+        # Safety: If pool is empty, use the first enemy in DB
+        safe_fill = pool[0] if pool else list(enemies_db.keys())[0]
+        waves = [safe_fill] * 3
+        for i in range(min(len(pool), 3)):
+            waves[i] = pool[i]
+        settings['active_waves'] = waves
+
+    settings['mode_2vs1'] = user_conf.get("mode_2vs1", False)
+    settings['exact_solver'] = user_conf.get("exact_solver", False)
+    settings['solve_budget_ms'] = user_conf.get("solve_budget_ms", 0)
+    return settings
+
+
+# --- SETUP ANALYSIS ---
+def setup_condition_mask(card_index, user_setup):
+    """CARD_TAGS mask of the wave conditions the equipped cards set up"""
+    mask = 0
+    for tower_id, config in user_setup.items():
+        for c in config.get("tier_1", []) + config.get("tier_2", []):
+            if c: mask |= card_index.condition_mask(c)
+    return mask
+
+def analyze_user_setup(card_index, user_setup):
+    return mask_tags(setup_condition_mask(card_index, user_setup))
+
+def has_matrix_thunderbolt_setup(card_setup):
+    """Check if Tesla Coil has Trap Matrix + Enhanced Matrix equipped (Matrix Thunderbolt setup)."""
+    if "tesla_coil" not in card_setup:
+        return False
+    setup = card_setup["tesla_coil"]
+    equipped = set([c for c in (setup.get("tier_1", []) + setup.get("tier_2", [])) if c])
+    return "Trap Matrix" in equipped and "Enhanced Matrix" in equipped
+
+
+# --- OPTIMIZER ---
+class Optimizer:
+    """Solver entry point for one card setup, usable without Streamlit.
+    The app hands in its shared score engine and result cache; scripts can let it build its own."""
+
+    def __init__(self, towers_db, enemies_db, synergy_db, card_index, card_setup, engine=None, cache=None, data_version="",
+                 ids=None, rules=None):
+        self.towers_db = towers_db
+        self.enemies_db = enemies_db
+        self.synergy_db = synergy_db
+        self.card_index = card_index
+        if rules is None and (ids is None or engine is None):
+            rules = load_scoring_rules(RULES_FILE)
+        self.ids = ids or GameIds(towers_db, enemies_db, card_index, rules)
+        self.card_setup = card_setup
+        self.engine = engine or ScoreEngine(towers_db, enemies_db, card_index, card_setup, rules)
+        self.cache = cache if cache is not None else ResultCache()
+        self.data_version = data_version
+        self._enemy_inputs = {}  # (enemy, inventory tuple) -> (score row, pair table, digest)
+
+    @timed("solve.prepare")
+    def enemy_inputs(self, enemy_ids, inventory_towers):
+        """Per enemy (tower score row, pair synergy table, digest of both) against inventory_towers,
+        int-indexed by inventory position. Computed once per enemy and inventory, so every
+        wave list drawn from the same pool reuses them."""
+        inventory = tuple(inventory_towers)
+        missing = [e for e in dict.fromkeys(enemy_ids) if (e, inventory) not in self._enemy_inputs]
+        if missing:
+            setup_conditions = setup_condition_mask(self.card_index, self.card_setup)
+            for e, row in zip(missing, self.engine.score_matrix(missing, inventory).tolist()):
+                pairs = self.ids.pair_synergies(e, inventory, setup_conditions)
+                self._enemy_inputs[(e, inventory)] = (row, pairs, content_key("enemy", row, pairs))
+        return [self._enemy_inputs[(e, inventory)] for e in enemy_ids]
+
+    def has_tesla_matrix(self, inventory_towers):
+        # Tesla Coil with the Matrix Thunderbolt setup (Trap Matrix + Enhanced Matrix)
+        return has_matrix_thunderbolt_setup(self.card_setup) and "tesla_coil" in inventory_towers
+
+    def prepare_solve_inputs(self, wave_enemies, inventory_towers):
+        """Plain-data inputs for loadout_solver, int-indexed by inventory position:
+        per-wave tower scores, per-wave pair synergy tables, Tesla flag"""
+        inputs = self.enemy_inputs(wave_enemies, inventory_towers)
+        return [row for row, _, _ in inputs], [pairs for _, pairs, _ in inputs], self.has_tesla_matrix(inventory_towers)
+
+    def _loadout_key(self, wave_enemies, inventory_towers, digests, has_tesla_matrix, mode_2vs1, exact, top_k):
+        # Keyed by the solver's actual inputs (per-enemy digests), so a card change that
+        # leaves these waves' scores untouched reuses the previous result
+        return content_key("loadout", self.data_version, list(wave_enemies), list(inventory_towers), digests,
+                           has_tesla_matrix, mode_2vs1, exact, top_k, self.ids.rules.vulnerable_multiplier)
+
+    def loadout_job(self, wave_enemies, inventory_towers, mode_2vs1=False, exact=False, top_k=1):
+        """Cache key and picklable solve_loadout arguments for one solve"""
+        inputs = self.enemy_inputs(wave_enemies, inventory_towers)
+        has_tesla_matrix = self.has_tesla_matrix(inventory_towers)
+        key = self._loadout_key(wave_enemies, inventory_towers, [digest for _, _, digest in inputs], has_tesla_matrix, mode_2vs1, exact, top_k)
+        return key, (list(inventory_towers), [row for row, _, _ in inputs], [pairs for _, pairs, _ in inputs],
+                     has_tesla_matrix, mode_2vs1, exact, top_k, self.ids.rules.vulnerable_multiplier)
+
+    def rank_many(self, wave_lists, inventory_towers, mode_2vs1=False, exact=False, top_k=1):
+        """rank_loadouts results for many wave lists at once, in order.
+        Cached solves are served directly. The rest are solved as one enemy pool: each enemy is
+        scored against the inventory once, and the workers assemble every wave list's solve
+        from the pool's shared team table (loadout_solver.solve_pool)."""
+        enemies = list(dict.fromkeys(e for waves in wave_lists for e in waves))
+        inputs = dict(zip(enemies, self.enemy_inputs(enemies, inventory_towers)))
+        has_tesla_matrix = self.has_tesla_matrix(inventory_towers)
+
+        ranked = [None] * len(wave_lists)
+        pending = []
+        for i, waves in enumerate(wave_lists):
+            key = self._loadout_key(waves, inventory_towers, [inputs[e][2] for e in waves], has_tesla_matrix, mode_2vs1, exact, top_k)
+            ranked[i] = self.cache.get(key)
+            if ranked[i] is None:
+                pending.append((i, key))
+
+        count("cache.hits", len(wave_lists) - len(pending))
+        count("cache.misses", len(pending))
+        if not pending:
+            return ranked
+        # Pool of the enemies that still need solving; triples index into it
+        pool = list(dict.fromkeys(e for i, _ in pending for e in wave_lists[i]))
+        position = {e: p for p, e in enumerate(pool)}
+        pool_job = (list(inventory_towers), [inputs[e][0] for e in pool], [inputs[e][1] for e in pool], has_tesla_matrix,
+                    mode_2vs1, exact, top_k, self.ids.rules.vulnerable_multiplier)
+        with span("solve.batch"):
+            solved = run_pool_solves(pool_job, [tuple(position[e] for e in wave_lists[i]) for i, _ in pending])
+        for (i, key), result in zip(pending, solved):
+            self.cache.put(key, result)
+            ranked[i] = result
+        return ranked
+
+    def rank_loadouts(self, wave_enemies, inventory_towers, mode_2vs1=False, exact=False, top_k=1):
+        """Up to top_k best lineups as [(allocation, wave_scores)], best first, plus an error message.
+        exact=True searches the full inventory instead of the 9 towers with the highest summed score."""
+        error = self._loadout_error(wave_enemies, inventory_towers)
+        if error:
+            return [], error
+        return self.rank_many([wave_enemies], inventory_towers, mode_2vs1, exact, top_k)[0], None
+
+    def iter_rank_loadouts(self, wave_enemies, inventory_towers, mode_2vs1=False, exact=False, top_k=1):
+        """Streaming rank_loadouts for one solve, run in this process.
+        Yields (best-so-far lineups, error, done, total); the last item is the final answer
+        and is cached like rank_loadouts, so a cached solve yields once."""
+        error = self._loadout_error(wave_enemies, inventory_towers)
+        if error:
+            yield [], error, 1, 1
+            return
+
+        key, job = self.loadout_job(list(wave_enemies), inventory_towers, mode_2vs1, exact, top_k)
+        ranked = self.cache.get(key)
+        if ranked is not None:
+            count("cache.hits")
+            yield ranked, None, 1, 1
+            return
+
+        count("cache.misses")
+        for done, total, ranked in iter_loadout(*job):
+            if done < total:
+                yield ranked, None, done, total
+        self.cache.put(key, ranked)
+        yield ranked, None, 1, 1
+
+    @timed("solve.anytime")
+    def anytime_loadouts(self, wave_enemies, inventory_towers, mode_2vs1=False, top_k=1, budget_s=None, max_evals=None):
+        """Budgeted full-inventory search (loadout_solver.solve_anytime), not cached since a time
+        budget makes it run-dependent. Returns (lineups, error, {'bound', 'gap', ...})"""
+        error = self._loadout_error(wave_enemies, inventory_towers)
+        if error:
+            return [], error, None
+        scores_matrix, pair_tables, has_tesla_matrix = self.prepare_solve_inputs(wave_enemies, inventory_towers)
+        ranked, info = solve_anytime(list(inventory_towers), scores_matrix, pair_tables, has_tesla_matrix, mode_2vs1, top_k,
+                                     self.ids.rules.vulnerable_multiplier, budget_s, max_evals)
+        return ranked, None, info
+
+    @staticmethod
+    def _loadout_error(wave_enemies, inventory_towers):
+        if len(inventory_towers) < 9:
+            return "Error: You need at least 9 towers in inventory to fill 3 waves!"
+        if len(wave_enemies) < 3:
+            return "Error: Wave data corrupted. Please reset in Setup."
+        return None
+
+    def solve_optimal_loadout(self, wave_enemies, inventory_towers, mode_2vs1=False, exact=False):
+        ranked, error = self.rank_loadouts(wave_enemies, inventory_towers, mode_2vs1, exact)
+        if error:
+            return None, None, error
+        if not ranked:
+            return None, [], None
+        best_allocation, best_wave_scores = ranked[0]
+        return best_allocation, best_wave_scores, None
+
+    @timed("weekly_top_teams")
+    def weekly_top_teams(self, weekly_enemies, available_towers, exact=False):
+        """Calculate the most frequently chosen tower teams across all wave combinations.
+        Accepts both normal 9-tower (3x3) and Tesla Matrix 7-tower (1+3+3) configurations."""
+        top_teams = []
+        for _, _, top_teams in self.iter_weekly_top_teams(weekly_enemies, available_towers, exact, chunk=None):
+            pass
+        return top_teams
+
+    def iter_weekly_top_teams(self, weekly_enemies, available_towers, exact=False, chunk=WEEKLY_CHUNK):
+        """weekly_top_teams as a generator of (done, total, top teams so far), solving chunk
+        wave triples per step (None: all at once). The first item comes before any solving and
+        the last one is final and cached, so a cached query yields once; closing the generator
+        early cancels the rest."""
+        if not weekly_enemies or len(available_towers) < 7:  # Minimum 7 for Tesla Matrix mode
+            yield 1, 1, []
+            return
+
+        # Popular queries (the shipped weekly defaults) are shared by every session
+        weekly_key = content_key("weekly", self.data_version, weekly_enemies, available_towers, self.card_setup, exact)
+        top_teams = self.cache.get(weekly_key)
+        if top_teams is not None:
+            yield 1, 1, top_teams
+            return
+
+        # Generate all possible 3-wave combinations (the solver itself needs a full 9-tower inventory)
+        wave_combos = list(combinations(weekly_enemies, 3)) if len(available_towers) >= 9 else []
+        step = chunk or max(1, len(wave_combos))
+        tally = empty_tally()
+        yield 0, len(wave_combos), []
+        for lo in range(0, len(wave_combos), step):
+            combos = wave_combos[lo:lo + step]
+            ranked = self.rank_many(combos, available_towers, mode_2vs1=False, exact=exact)
+            # Count team appearances and track complete sets (can be 7 or 9 towers), then fold
+            # this chunk's tally into the running one
+            merge_tallies(tally, reduce_tallies(tally_loadout(combo, result[0][0] if result else None)
+                                                for combo, result in zip(combos, ranked)))
+            if lo + step < len(wave_combos):
+                yield lo + step, len(wave_combos), self._top_teams(tally)
+
+        top_teams = self._top_teams(tally)
+        self.cache.put(weekly_key, top_teams)
+        yield 1, 1, top_teams
+
+    def _top_teams(self, tally):
+        """Teams of the most frequent complete set in a (possibly partial) weekly tally"""
+        complete_sets = tally['complete_sets']
+        team_counts = tally['team_counts']
+        team_effectiveness = tally['team_effectiveness']
+
+        # Find the most frequent complete set
+        if not complete_sets:
+            return []
+
+        # Get the most common complete set
+        best_complete_set = max(complete_sets.items(), key=lambda x: x[1])[0]
+
+        # Prepare results with the teams from the best complete set (copies, the tally keeps growing)
+        top_teams = []
+        for team_key in best_complete_set:
+            effectiveness_data = team_effectiveness.get(team_key, {})
+            if effectiveness_data:
+                effectiveness_data = {**effectiveness_data, 'specific_enemies': dict(effectiveness_data['specific_enemies'])}
+            # Check if this is a Tesla-only team
+            is_tesla_only = team_key == ("tesla_coil",)
+            team_info = {
+                'towers': [self.towers_db[tid]['name'] for tid in team_key],
+                'tower_ids': list(team_key),
+                'count': team_counts.get(team_key, 0),
+                'effectiveness': effectiveness_data,
+                'wave_index': effectiveness_data.get('wave_index', 0),
+                'is_tesla_only': is_tesla_only
+            }
+            top_teams.append(team_info)
+
+        # Sort by wave index to maintain order
+        top_teams.sort(key=lambda x: x['wave_index'])
+        return top_teams
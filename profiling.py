@@ -0,0 +1,99 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger("gd_optimizer.profile")
+
+# Process-wide registry. Spans are coarse (one per solve / table / render call),
+# so a lock and a perf_counter pair per span is noise next to the work they time.
+_lock = threading.Lock()
+_spans = {}     # name -> [calls, total_s, max_s]
+_counters = {}  # name -> int
+
+
+def record(name, seconds):
+    with _lock:
+        entry = _spans.get(name)
+        if entry is None:
+            _spans[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block under name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of span"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, n=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def raw():
+    """Picklable copy of the registry, for shipping worker stats back to the parent"""
+    with _lock:
+        return {'spans': {k: list(v) for k, v in _spans.items()}, 'counters': dict(_counters)}
+
+
+def merge(data):
+    """Fold a raw() copy from another process into this one"""
+    with _lock:
+        for name, (calls, total, peak) in data['spans'].items():
+            entry = _spans.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += total
+            entry[2] = max(entry[2], peak)
+        for name, n in data['counters'].items():
+            _counters[name] = _counters.get(name, 0) + n
+
+
+def snapshot():
+    """Spans (calls, total/mean/max ms, slowest total first) and counters as plain JSON data"""
+    data = raw()
+    spans = {
+        name: {
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'mean_ms': round(total * 1000 / calls, 3),
+            'max_ms': round(peak * 1000, 3),
+        }
+        for name, (calls, total, peak) in sorted(data['spans'].items(), key=lambda kv: -kv[1][1])
+    }
+    return {'spans': spans, 'counters': dict(sorted(data['counters'].items()))}
+
+
+def dump(fp):
+    """Write snapshot() as JSON to an open file and log it at DEBUG"""
+    data = snapshot()
+    json.dump(data, fp, indent=2)
+    fp.write("\n")
+    logger.debug("profile %s", json.dumps(data))
+    return data
@@ -0,0 +1,65 @@
+import heapq
+import time
+from itertools import count
+
+
+class TopK:
+    """Keeps the k best (score, item) pairs seen so far in a bounded min-heap.
+    O(log k) per push and O(k) memory. On equal scores the item pushed first wins.
+    An optional key drops later pushes of an item that is already kept."""
+
+    def __init__(self, k):
+        self.k = max(1, k)
+        self._heap = []  # (score, -seq, key, item), worst entry at _heap[0]
+        self._keys = set()
+        self._seq = count()
+
+    @property
+    def threshold(self):
+        """Score a new item has to beat to get in (-inf until the heap is full)"""
+        if len(self._heap) < self.k:
+            return -float('inf')
+        return self._heap[0][0]
+
+    def push(self, score, item, key=None):
+        """Offer an item; returns True if it is kept"""
+        if key is not None and key in self._keys:
+            return False
+        if len(self._heap) >= self.k and score <= self._heap[0][0]:
+            return False
+
+        entry = (score, -next(self._seq), key, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        else:
+            evicted = heapq.heapreplace(self._heap, entry)
+            self._keys.discard(evicted[2])
+        if key is not None:
+            self._keys.add(key)
+        return True
+
+    def results(self):
+        """Kept (score, item) pairs, best first"""
+        return [(score, item) for score, _, _, item in sorted(self._heap, key=lambda e: (-e[0], -e[1]))]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class SearchBudget:
+    """Stopping rule for an anytime search: wall-clock budget_s seconds, max_evals evaluations,
+    or default_evals evaluations when neither is given. Callers add to evaluations as they go."""
+
+    def __init__(self, budget_s=None, max_evals=None, default_evals=None):
+        self.started = time.perf_counter()
+        self.deadline = self.started + budget_s if budget_s else None
+        self.max_evals = default_evals if max_evals is None and self.deadline is None else max_evals
+        self.evaluations = 0
+
+    def spent(self):
+        if self.max_evals is not None and self.evaluations >= self.max_evals:
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
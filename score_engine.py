@@ -0,0 +1,169 @@
+import numpy as np
+
+from card_index import CARD_TAGS, check_mask_width
+from profiling import timed
+from scoring_rules import ROLE_PREFIX, load_scoring_rules
+
+
+def _bits(bits, names):
+    mask = 0
+    for name in names:
+        mask |= bits.get(name, 0)
+    return mask
+
+
+def selected_card_names(card_setup, tower_id):
+    """Names of the Tier 1 + Tier 2 cards equipped on a tower (empty slots dropped)"""
+    setup = card_setup.get(tower_id, {})
+    return [c for c in setup.get("tier_1", []) + setup.get("tier_2", []) if c]
+
+
+class ScoreEngine:
+    """Compiles the tower/card setup into feature bitmasks once and scores every
+    enemy x tower pair in a single vectorized pass of the scoring rules"""
+
+    @timed("score_engine.compile")
+    def __init__(self, towers_db, enemies_db, card_index, card_setup, rules=None):
+        self.rules = rules or load_scoring_rules()
+        self.tower_ids = list(towers_db.keys())
+        self.enemy_ids = list(enemies_db.keys())
+        self.tower_index = {tid: i for i, tid in enumerate(self.tower_ids)}
+        self.enemy_index = {eid: i for i, eid in enumerate(self.enemy_ids)}
+
+        self.chains = self._collect_chains(card_index, card_setup)
+
+        # Card effect masks are CARD_TAGS masks, so CARD_TAGS come first and keep their bit
+        # positions; then the tags a rule tests, then any tag that can meet a weakness/resistance
+        matchable = set()
+        for e in enemies_db.values():
+            matchable.update(e.get('weakness_types', []))
+            matchable.update(e.get('resistance_types', []))
+        vocab = list(CARD_TAGS)
+        vocab.extend(t for t in self.rules.tower_tags() if t not in vocab)
+        for tower in towers_db.values():
+            candidates = set(tower.get('damage_tags', [])) | {tower.get('type')}
+            vocab.extend(sorted(t for t in candidates if t in matchable and t not in vocab))
+        check_mask_width(vocab)
+        self.tag_bits = {tag: 1 << i for i, tag in enumerate(vocab)}
+        self.immunity_bits = {name: 1 << i for i, name in enumerate(self.rules.enemy_names("enemy_immune"))}
+        self.enemy_tag_bits = {name: 1 << i for i, name in enumerate(self.rules.enemy_names("enemy_tags"))}
+
+        self._compile_towers(towers_db, self._collect_card_effects(card_index, card_setup))
+        self._compile_enemies(enemies_db)
+        self.matrix, self._note_masks = self._evaluate()
+
+    # --- COMPILATION ---
+    def _collect_chains(self, card_index, card_setup):
+        """Highest equipped chain step per chain group, per tower"""
+        chains = {}
+        for tower_id in card_setup:
+            groups = {}
+            for name in selected_card_names(card_setup, tower_id):
+                card = card_index.card(tower_id, name)
+                if card and card['tier'] in (1, 2) and 'chain_group' in card:
+                    group = card['chain_group']
+                    step = card['chain_step']
+                    if group not in groups or step > groups[group]:
+                        groups[group] = step
+            if groups:
+                chains[tower_id] = groups
+        return chains
+
+    def _collect_card_effects(self, card_index, card_setup):
+        """Per tower, the OR of the status effect masks of its equipped cards"""
+        effects = []
+        for tower_id in self.tower_ids:
+            mask = 0
+            for card_name in selected_card_names(card_setup, tower_id):
+                mask |= card_index.effect_mask(card_name)
+            effects.append(mask)
+        return effects
+
+    def _mask(self, tags):
+        return _bits(self.tag_bits, tags)
+
+    def _compile_towers(self, towers_db, card_effects):
+        n = len(self.tower_ids)
+        self.tower_active = np.zeros(n, dtype=np.uint64)
+        # Active tags plus the tower's own type, matched against weaknesses/resistances
+        self.tower_affinity = np.zeros(n, dtype=np.uint64)
+        self.tower_base = np.zeros(n, dtype=np.float64)
+        roles = [t for t in self.tag_bits if t.startswith(ROLE_PREFIX)]
+
+        for i, tower_id in enumerate(self.tower_ids):
+            tower = towers_db[tower_id]
+            role = tower.get('role', '')
+            active = self._mask(tower.get('damage_tags', [])) | card_effects[i]
+            active |= self._mask(r for r in roles if r[len(ROLE_PREFIX):] in role)
+            self.tower_active[i] = active
+            self.tower_affinity[i] = active | self._mask([tower.get('type')])
+            self.tower_base[i] = self.rules.base + len(self.chains.get(tower_id, {})) * self.rules.per_chain_group
+
+    def _compile_enemies(self, enemies_db):
+        n = len(self.enemy_ids)
+        self.enemy_weak = np.zeros(n, dtype=np.uint64)
+        self.enemy_resist = np.zeros(n, dtype=np.uint64)
+        self.enemy_immune = np.zeros(n, dtype=np.uint64)  # immunity_bits
+        self.enemy_tags = np.zeros(n, dtype=np.uint64)    # enemy_tag_bits
+
+        for i, enemy_id in enumerate(self.enemy_ids):
+            enemy = enemies_db[enemy_id]
+            self.enemy_weak[i] = self._mask(enemy.get('weakness_types', []))
+            self.enemy_resist[i] = self._mask(enemy.get('resistance_types', []))
+            self.enemy_immune[i] = _bits(self.immunity_bits, enemy.get('immunities', []))
+            self.enemy_tags[i] = _bits(self.enemy_tag_bits, enemy.get('tags', []))
+
+    def _rule_mask(self, rule):
+        """Boolean enemy x tower grid where every condition of one rule holds"""
+        enemy_ok = np.ones(len(self.enemy_ids), dtype=bool)
+        tower_ok = np.ones(len(self.tower_ids), dtype=bool)
+        if 'enemy_immune' in rule:
+            enemy_ok &= (self.enemy_immune & np.uint64(_bits(self.immunity_bits, rule['enemy_immune']))) != 0
+        if 'enemy_tags' in rule:
+            enemy_ok &= (self.enemy_tags & np.uint64(_bits(self.enemy_tag_bits, rule['enemy_tags']))) != 0
+        if 'tower_any' in rule:
+            tower_ok &= (self.tower_active & np.uint64(self._mask(rule['tower_any']))) != 0
+        if 'tower_none' in rule:
+            tower_ok &= (self.tower_active & np.uint64(self._mask(rule['tower_none']))) == 0
+        mask = enemy_ok[:, None] & tower_ok[None, :]
+        if 'affinity' in rule:
+            enemy_mask = self.enemy_weak if rule['affinity'] == "weakness" else self.enemy_resist
+            mask &= (enemy_mask[:, None] & self.tower_affinity[None, :]) != 0
+        return mask
+
+    # --- EVALUATION ---
+    def _evaluate(self):
+        """Apply every scoring rule to the full enemy x tower grid, in rule order"""
+        score = np.tile(self.tower_base, (len(self.enemy_ids), 1))
+        notes = []
+        for rule in self.rules.tower_rules:
+            mask = self._rule_mask(rule)
+            if 'multiply' in rule:
+                score[mask] *= rule['multiply']
+            else:
+                score[mask] += rule['add']
+            if rule.get('note'):
+                notes.append((rule['note'], mask))
+        return score.astype(np.int64), notes
+
+    # --- LOOKUPS ---
+    def score_matrix(self, enemy_ids, tower_ids):
+        """Sub-matrix of integer scores, rows follow enemy_ids and columns tower_ids"""
+        rows = [self.enemy_index[e] for e in enemy_ids]
+        cols = [self.tower_index[t] for t in tower_ids]
+        return self.matrix[np.ix_(rows, cols)]
+
+    def score(self, enemy_id, tower_id):
+        """Single (score, notes) pair, same shape as the old calculate_single_score"""
+        e, t = self.enemy_index[enemy_id], self.tower_index[tower_id]
+        notes = [note for note, mask in self._note_masks if mask[e, t]]
+        return int(self.matrix[e, t]), ", ".join(notes)
+
+    def chains_text(self, tower_id):
+        chains = self.chains.get(tower_id)
+        if not chains: return ""
+        parts = []
+        for group, step in chains.items():
+            roman = "I" * step if step < 4 else str(step)
+            parts.append(f"{group} ({roman})")
+        return "⛓️ " + ", ".join(parts)
@@ -0,0 +1,79 @@
+"""Scoring weights as data (data/scoring_rules.json), checked once at load.
+
+Tower rules run in file order over the enemy x tower grid. Every key of a rule is a
+condition that must hold, then the score is multiplied or added to:
+
+    enemy_immune / enemy_tags   enemy has any of these immunities / tags
+    tower_any / tower_none      tower has any / none of these tags ("role:X" = X in the role)
+    affinity                    "weakness" or "resistance": enemy list meets tower tags or type
+
+Combo rules run in file order over each synergy card's points:
+
+    affinity                    "weakness" or "resistance": enemy list meets the combo's tags
+    setup                       the equipped cards set up this condition (CARD_TAGS name)
+    description                 lower-case fragment of the combo card's description"""
+import json
+import os
+
+from card_index import CARD_TAG_BITS
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "scoring_rules.json")
+
+TOWER_CONDITIONS = {"enemy_immune", "enemy_tags", "tower_any", "tower_none", "affinity"}
+COMBO_CONDITIONS = {"affinity", "setup", "description"}
+AFFINITIES = ("weakness", "resistance")
+ROLE_PREFIX = "role:"
+
+
+def _check_rules(rules, conditions, section):
+    for n, rule in enumerate(rules):
+        where = f"{section} rule {n + 1}"
+        unknown = set(rule) - conditions - {"note", "multiply", "add"}
+        if unknown:
+            raise ValueError(f"{where}: unknown keys {sorted(unknown)}")
+        if ("multiply" in rule) == ("add" in rule):
+            raise ValueError(f"{where}: needs exactly one of 'multiply' or 'add'")
+        if "affinity" in rule and rule["affinity"] not in AFFINITIES:
+            raise ValueError(f"{where}: affinity must be one of {AFFINITIES}")
+        if "setup" in rule and rule["setup"] not in CARD_TAG_BITS:
+            raise ValueError(f"{where}: unknown setup condition {rule['setup']!r}")
+        # Matched against lower-cased card text, so an upper-case fragment could never match
+        if "description" in rule and rule["description"] != rule["description"].lower():
+            raise ValueError(f"{where}: description fragment must be lower-case, got {rule['description']!r}")
+
+
+class ScoringRules:
+    """Validated rule tables; ScoreEngine and GameIds compile them into array operations"""
+
+    def __init__(self, spec):
+        tower, combo = spec.get("tower", {}), spec.get("combo", {})
+        self.base = float(tower.get("base", 100))
+        self.per_chain_group = float(tower.get("per_chain_group", 15))
+        self.tower_rules = list(tower.get("rules", []))
+        self.points_per_score = float(combo.get("points_per_score", 10))
+        self.default_score = combo.get("default_score", 5)
+        self.vulnerable_multiplier = float(combo.get("vulnerable_multiplier", 1.15))
+        self.combo_rules = list(combo.get("rules", []))
+        _check_rules(self.tower_rules, TOWER_CONDITIONS, "tower")
+        _check_rules(self.combo_rules, COMBO_CONDITIONS, "combo")
+
+    def tower_tags(self):
+        """Tower tags the rules test, in first-use order (role: entries included)"""
+        tags = []
+        for rule in self.tower_rules:
+            for tag in rule.get("tower_any", []) + rule.get("tower_none", []):
+                if tag not in tags:
+                    tags.append(tag)
+        return tags
+
+    def enemy_names(self, key):
+        """Enemy immunities ("enemy_immune") or tags ("enemy_tags") the rules test"""
+        names = []
+        for rule in self.tower_rules:
+            names.extend(n for n in rule.get(key, []) if n not in names)
+        return names
+
+
+def load_scoring_rules(path=RULES_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return ScoringRules(json.load(f))
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import pickle
+import threading
+from collections import OrderedDict
+
+
+def _canonical(value):
+    """Turn solver inputs into JSON-stable data (frozensets/sets sorted, tuples as lists)"""
+    if isinstance(value, dict):
+        items = [(_canonical(k), _canonical(v)) for k, v in value.items()]
+        return sorted(items, key=lambda kv: json.dumps(kv[0]))
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(v) for v in value), key=json.dumps)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def content_key(*parts):
+    """Stable hash of everything a result depends on"""
+    payload = json.dumps(_canonical(parts), separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed store for solver results, safe to share between sessions.
+    Least recently used entries are evicted past max_entries, and past max_bytes
+    (pickled size) when that is set. An optional backing store (DiskCache) is read
+    on a memory miss and written through on every put."""
+
+    def __init__(self, max_entries=4096, max_bytes=None, backing=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backing = backing
+        self._store = OrderedDict()  # key -> (value, size in bytes or 0)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.backing_hits = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is not None:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        value = self.backing.get(key) if self.backing is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.backing_hits += 1
+        self._insert(key, value)
+        return value
+
+    def put(self, key, value):
+        self._insert(key, value)
+        if self.backing is not None:
+            self.backing.put(key, value)
+
+    def _insert(self, key, value):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) if self.max_bytes else 0
+        with self._lock:
+            old = self._store.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._store[key] = (value, size)
+            self._bytes += size
+            while len(self._store) > 1 and (len(self._store) > self.max_entries or
+                                            (self.max_bytes and self._bytes > self.max_bytes)):
+                _, (_, evicted_size) = self._store.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.backing_hits + self.misses
+            return {
+                'entries': len(self._store),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes if self.max_bytes else None,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'backing_hits': self.backing_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.backing_hits) / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+            }
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._store
+
+    def __len__(self):
+        with self._lock:
+            return len(self._store)
@@ -0,0 +1,28 @@
+import io
+import json
+
+import gd_optimizer
+
+INVENTORY = "guardian,railgun,aeroblast,thunderbolt,laser,hive,beam,sky_guard,firewheel_drone"
+WAVES = "abyss_dominator,eye_of_the_void,elite_specter"
+
+
+def run_cli(*argv):
+    out = io.StringIO()
+    code = gd_optimizer.main(["--defaults-only", "--no-disk-cache", *argv], out=out)
+    return code, json.loads(out.getvalue())
+
+
+def test_solve_takes_inventory_and_exact_after_the_command():
+    code, result = run_cli("solve", "--waves", WAVES, "--inventory", INVENTORY, "--exact", "--top-k", "2")
+    assert code == 0
+    assert result['waves'] == WAVES.split(",")
+    assert result['error'] is None
+    lineup = result['lineups'][0]
+    assert sorted(t for team in lineup['allocation'] for t in team) == sorted(INVENTORY.split(","))
+
+
+def test_weekly_takes_inventory_after_the_command():
+    args = gd_optimizer.build_parser().parse_args(["weekly", "--inventory", INVENTORY, "--exact"])
+    assert args.inventory == INVENTORY.split(",")
+    assert args.exact is True
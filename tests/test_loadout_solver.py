@@ -0,0 +1,63 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from loadout_solver import TeamTable, solve_exact
+
+
+def random_inputs(n, tesla, seed):
+    rng = random.Random(seed)
+    towers = [f"t{i}" for i in range(n)]
+    if tesla:
+        towers[0] = "tesla_coil"
+    tower_scores = [[rng.randint(1, 50) for _ in range(n)] for _ in range(3)]
+    pair_tables = []
+    for _ in range(3):
+        pairs = [(i, j) for i, j in combinations(range(n), 2) if rng.random() < 0.15]
+        pair_tables.append(([i for i, _ in pairs], [j for _, j in pairs],
+                            [rng.randint(5, 30) for _ in pairs], [int(rng.random() < 0.3) for _ in pairs]))
+    return towers, tower_scores, pair_tables
+
+
+def brute_force_metrics(table, tesla, mode_2vs1):
+    """Metric of every lineup of the shape, best first"""
+    towers = range(len(table.towers))
+    if tesla:
+        solo = table.index["tesla_coil"]
+        others = [i for i in towers if i != solo]
+        lineups = []
+        for k in range(3):
+            for a in combinations(others, 3):
+                for b in combinations([i for i in others if i not in a], 3):
+                    teams, rest = [None] * 3, iter((a, b))
+                    for w in range(3):
+                        teams[w] = (solo,) if w == k else next(rest)
+                    lineups.append(teams)
+    else:
+        lineups = []
+        for a in combinations(towers, 3):
+            left = [i for i in towers if i not in a]
+            for b in combinations(left, 3):
+                for c in combinations([i for i in left if i not in b], 3):
+                    lineups.append([a, b, c])
+
+    metrics = []
+    for teams in lineups:
+        scores = [table.team_score(w, tuple(table.towers[i] for i in team)) for w, team in enumerate(teams)]
+        metrics.append(sum(sorted(scores, reverse=True)[:2]) if mode_2vs1 else sum(scores))
+    return sorted(metrics, reverse=True)
+
+
+@pytest.mark.parametrize("tesla", [False, True])
+@pytest.mark.parametrize("mode_2vs1", [False, True])
+@pytest.mark.parametrize("seed", range(4))
+def test_solve_exact_matches_brute_force(tesla, mode_2vs1, seed):
+    towers, tower_scores, pair_tables = random_inputs(10, tesla, seed)
+    table = TeamTable(towers, tower_scores, pair_tables)
+    expected = brute_force_metrics(table, tesla, mode_2vs1)[:5]
+
+    results = solve_exact(towers, tower_scores, pair_tables, tesla, mode_2vs1, top_k=5)
+    metrics = [sum(sorted(ws, reverse=True)[:2]) if mode_2vs1 else sum(ws) for _, ws in results]
+    assert metrics == pytest.approx(expected)
+    assert len({tuple(allocation) for allocation, _ in results}) == len(results)
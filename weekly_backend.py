@@ -0,0 +1,165 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import reduce
+
+import profiling
+from loadout_solver import solve_pool
+
+# A table-driven solve takes ~1-2 ms, so below this many pending triples the
+# pool start-up/transfer cost outweighs the gain
+MIN_PARALLEL_JOBS = 256
+MAX_WORKERS = int(os.environ.get("GD_OPTIMIZER_WORKERS", 0)) or os.cpu_count() or 1
+
+_pool = None
+# BackgroundRun threads of several sessions may ask for the pool at once
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Persistent worker pool, started on first use and kept for the life of the process"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: workers start a fresh interpreter instead of forking the app's threads and
+            # state. They still re-import the parent's __main__ (the streamlit launcher under
+            # `streamlit run`), then this module and loadout_solver for the tasks.
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _solve_pool_task(task):
+    """Worker side: one chunk of pool triples plus the spans/counters it recorded"""
+    profiling.reset()
+    pool_job, triples = task
+    return solve_pool(*pool_job[:4], triples, *pool_job[4:]), profiling.raw()
+
+
+def run_pool_solves(pool_job, triples):
+    """solve_pool over many triples of one enemy pool, in order.
+    pool_job is (inventory, per-enemy tower scores, per-enemy pair tables, Tesla flag,
+    mode_2vs1, exact, top_k, vulnerable multiplier); every worker task carries the pool
+    inputs once and builds its team table once for its whole chunk of triples."""
+    if len(triples) < MIN_PARALLEL_JOBS or MAX_WORKERS <= 1:
+        return solve_pool(*pool_job[:4], triples, *pool_job[4:])
+
+    size = -(-len(triples) // (MAX_WORKERS * 2))
+    tasks = [(pool_job, triples[i:i + size]) for i in range(0, len(triples), size)]
+    try:
+        results = []
+        for chunk, stats in get_pool().map(_solve_pool_task, tasks):
+            profiling.merge(stats)
+            results.extend(chunk)
+        return results
+    except BrokenProcessPool:
+        # A worker died (OOM, killed); drop the pool and finish inline
+        shutdown_pool()
+        return solve_pool(*pool_job[:4], triples, *pool_job[4:])
+
+
+# --- MAP / REDUCE OF WEEKLY TEAM STATS ---
+def empty_tally():
+    return {'complete_sets': {}, 'team_counts': {}, 'team_effectiveness': {}}
+
+
+def tally_loadout(wave_combo, best_loadout):
+    """Map step: stats contributed by the best loadout of one wave triple"""
+    tally = empty_tally()
+    if not best_loadout or len(best_loadout) != 3:
+        return tally
+
+    # Count total unique towers used
+    all_towers_used = set()
+    for team in best_loadout:
+        all_towers_used.update(team)
+
+    # Accept both 9-tower (normal 3x3) and 7-tower (Tesla solo + 2x3) configurations
+    if len(all_towers_used) not in (9, 7):
+        return tally
+
+    # Create a key for the complete set (sorted for consistency)
+    sorted_teams = [tuple(sorted(team)) for team in best_loadout]
+    set_key = tuple(sorted(sorted_teams))  # Sort the 3 teams themselves
+    tally['complete_sets'][set_key] = 1
+
+    for i, team in enumerate(best_loadout):
+        team_key = tuple(sorted(team))
+        tally['team_counts'][team_key] = tally['team_counts'].get(team_key, 0) + 1
+
+        # This team was chosen for the specific enemy at wave position i
+        effectiveness = tally['team_effectiveness'].setdefault(team_key, {
+            'specific_enemies': {},  # enemy_id -> count
+            'wave_index': i
+        })
+        enemy_id = wave_combo[i]
+        effectiveness['specific_enemies'][enemy_id] = effectiveness['specific_enemies'].get(enemy_id, 0) + 1
+
+    return tally
+
+
+def merge_tallies(left, right):
+    """Reduce step: fold right into left (in place) and return left.
+    Order matters only for wave_index, which keeps the first triple's value"""
+    for key, count in right['complete_sets'].items():
+        left['complete_sets'][key] = left['complete_sets'].get(key, 0) + count
+    for key, count in right['team_counts'].items():
+        left['team_counts'][key] = left['team_counts'].get(key, 0) + count
+    for key, data in right['team_effectiveness'].items():
+        target = left['team_effectiveness'].setdefault(key, {'specific_enemies': {}, 'wave_index': data['wave_index']})
+        for enemy_id, count in data['specific_enemies'].items():
+            target['specific_enemies'][enemy_id] = target['specific_enemies'].get(enemy_id, 0) + count
+    return left
+
+
+def reduce_tallies(tallies):
+    return reduce(merge_tallies, tallies, empty_tally())
+
+
+# --- BACKGROUND WEEKLY RUNS ---
+class BackgroundRun:
+    """Drains a (done, total, partial result) generator on a daemon thread, so the UI can
+    keep rendering and poll progress. The first step runs in the caller (it should be cheap,
+    e.g. a cache lookup); cancel() stops the thread before its next step."""
+
+    def __init__(self, key, steps):
+        self.key = key
+        self.error = None
+        # Latest step, replaced whole so readers never see it half-written
+        self.progress = next(steps, (1, 1, None))
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(steps,), daemon=True)
+        self._thread.start()
+
+    def _run(self, steps):
+        try:
+            for step in steps:
+                self.progress = step
+                if self._cancelled.is_set():
+                    break
+        except Exception as exc:  # surfaced by the UI on its next poll
+            self.error = exc
+        finally:
+            steps.close()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def finished(self):
+        """Ran to the end (not cancelled, no error); progress then holds the final result"""
+        return not self.running and not self._cancelled.is_set() and self.error is None
+